@@ -0,0 +1,135 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+from app.config import settings
+
+METADATA = "metadata"
+MEASUREMENTS = "measurements"
+
+# Endpointy odczytu i zakresy danych, od których zależy ich odpowiedź
+CACHED_ROUTES: list[tuple[re.Pattern, tuple[str, ...]]] = [
+    (re.compile(rf"^{settings.API_V1_STR}/stations/?$"), (METADATA,)),
+    (re.compile(rf"^{settings.API_V1_STR}/stations/[^/]+/?$"), (METADATA,)),
+    (re.compile(rf"^{settings.API_V1_STR}/sensors/?$"), (METADATA, MEASUREMENTS)),
+]
+
+
+class CachedResponse:
+    __slots__ = ("body", "content_type", "etag", "expires_at")
+
+    def __init__(self, body: bytes, content_type: str | None, ttl: float):
+        self.body = body
+        self.content_type = content_type
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self.expires_at = time.monotonic() + ttl
+
+
+class ResponseCache:
+    """
+    Pamięć podręczna odpowiedzi w procesie: LRU o ograniczonym rozmiarze.
+    Klucz zawiera numery wersji zakresów danych, więc podbicie wersji przy
+    synchronizacji metadanych lub zapisie pomiarów unieważnia stare wpisy.
+    TTL ogranicza nieaktualność między workerami, które mają własne liczniki.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._versions: dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def bump(self, *scopes: str) -> None:
+        """Unieważnia odpowiedzi zależne od podanych zakresów danych."""
+        with self._lock:
+            for scope in scopes or (METADATA, MEASUREMENTS):
+                self._versions[scope] += 1
+
+    def version(self, scope: str) -> int:
+        """Aktualny numer wersji zakresu danych - pozwala innym pamięciom podręcznym wykryć zmianę."""
+        return self._versions[scope]
+
+    def key(self, request: Request, scopes: tuple[str, ...]) -> str:
+        params = "&".join(
+            f"{name}={value}" for name, value in sorted(request.query_params.multi_items())
+        )
+        versions = ",".join(f"{scope}:{self._versions[scope]}" for scope in scopes)
+        return f"{request.url.path}?{params}#{versions}"
+
+    def get(self, key: str) -> CachedResponse | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, body: bytes, content_type: str | None) -> CachedResponse:
+        entry = CachedResponse(body, content_type, self.ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache(settings.CACHE_MAX_ENTRIES, settings.CACHE_TTL_SECONDS)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+class ResponseCacheMiddleware(BaseHTTPMiddleware):
+    """
+    Obsługuje zapytania GET do endpointów z CACHED_ROUTES z pamięci podręcznej.
+    Trafienie nie uruchamia handlera ani zapytań do bazy, a klient z aktualnym
+    ETag dostaje 304 Not Modified.
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        if request.method != "GET":
+            return await call_next(request)
+
+        scopes = next(
+            (scopes for pattern, scopes in CACHED_ROUTES if pattern.match(request.url.path)),
+            None,
+        )
+        if scopes is None:
+            return await call_next(request)
+
+        key = response_cache.key(request, scopes)
+        entry = response_cache.get(key)
+
+        if entry is None:
+            response = await call_next(request)
+            if response.status_code != 200:
+                return response
+
+            body = b"".join([chunk async for chunk in response.body_iterator])
+            entry = response_cache.put(key, body, response.headers.get("content-type"))
+
+        headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+        if etag_matches(request, entry.etag):
+            return Response(status_code=304, headers=headers)
+
+        if entry.content_type:
+            headers["Content-Type"] = entry.content_type
+        return Response(content=entry.body, headers=headers)
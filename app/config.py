@@ -18,12 +18,88 @@ class Settings(BaseSettings):
     BACKEND_URL: str
     
     SQLALCHEMY_DATABASE_URL: str
+    # Optional, derived from SQLALCHEMY_DATABASE_URL (postgresql+asyncpg) when empty
+    ASYNC_SQLALCHEMY_DATABASE_URL: str = ""
 
     SECRET_KEY: str
     
     EMAIL_EMAIL: EmailStr
     EMAIL_PASSWORD: str
 
+    # DATABASE POOL
+    # Connection budget: replicas x uvicorn workers x (async pool + sync pool)
+    # must stay below Postgres max_connections (100 by default, 3 reserved).
+    # Defaults: 2 replicas x 2 workers x (8 + 6) = 56 connections.
+    # Async engine - read endpoints
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 3
+    # Sync engine - writes, ingestion, reports, jobs and coordination
+    DB_SYNC_POOL_SIZE: int = 3
+    DB_SYNC_MAX_OVERFLOW: int = 3
+    DB_POOL_TIMEOUT_SECONDS: int = 30
+    DB_POOL_RECYCLE_SECONDS: int = 30 * 60
+    DB_CONNECT_RETRIES: int = 10
+    DB_CONNECT_BACKOFF_SECONDS: float = 1.0
+    DB_CONNECT_BACKOFF_MAX_SECONDS: float = 30.0
+
+    # GIOS API
+    GIOS_RATE_PER_SECOND: float = 5.0
+    GIOS_BURST: float = 10.0
+    GIOS_MIN_CONCURRENCY: int = 2
+    GIOS_MAX_CONCURRENCY: int = 25
+    GIOS_MAX_RETRIES: int = 5
+    GIOS_BACKOFF_BASE_SECONDS: float = 1.0
+    GIOS_BACKOFF_MAX_SECONDS: float = 60.0
+    GIOS_TIMEOUT_SECONDS: float = 10.0
+
+    # INGESTION
+    INGEST_CONCURRENCY: int = 10
+    INGEST_QUEUE_SIZE: int = 50
+    INGEST_BATCH_SIZE: int = 50
+    INGEST_INTERVAL_SECONDS: int = 15 * 60  # domyślny interwał nowych subskrypcji
+
+    # SCHEMA
+    # Run app.migrations when the app starts (otherwise: python -m app.migrations)
+    MIGRATE_ON_STARTUP: bool = False
+
+    # MEASUREMENTS STORAGE
+    MEASUREMENTS_PARTITIONED: bool = False
+    MEASUREMENTS_PARTITIONS_AHEAD: int = 3
+    MEASUREMENTS_RETENTION_MONTHS: int = 0  # 0 - bez limitu
+
+    # EXPORTS
+    EXPORT_BATCH_SIZE: int = 5000
+    EXPORT_PARQUET_ROW_GROUP_SIZE: int = 256_000
+
+    # RESPONSE CACHE
+    CACHE_MAX_ENTRIES: int = 1024
+    CACHE_TTL_SECONDS: int = 60
+
+    # SCHEDULER
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_TICK_SECONDS: int = 15
+    SCHEDULER_MAX_SENSORS_PER_TICK: int = 500
+    SCHEDULER_MAX_BACKOFF_SECONDS: int = 60 * 60
+
+    # INGESTION COORDINATION
+    COORDINATION_SHARDS: int = 64  # musi być taka sama we wszystkich replikach
+    COORDINATION_LEASE_SECONDS: int = 60
+    COORDINATION_HEARTBEAT_SECONDS: int = 15
+    COORDINATION_VIRTUAL_NODES: int = 64
+
+    # BACKGROUND JOBS
+    JOB_HEARTBEAT_SECONDS: int = 5
+    JOB_RETENTION_DAYS: int = 7
+
+    # REPORTS
+    REPORT_WORKERS: int = 2
+    REPORT_CACHE_MAX_ENTRIES: int = 32
+    REPORT_RETENTION_DAYS: int = 7
+    REPORT_CHART_POINTS: int = 500
+
+    # METADATA SNAPSHOT
+    METADATA_SNAPSHOT_TTL_SECONDS: int = 60
+
 
 
 settings = Settings()
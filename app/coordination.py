@@ -0,0 +1,250 @@
+import asyncio
+import bisect
+import hashlib
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal, engine
+from app.models import IngestionLease, IngestionWorker
+
+# Nazwy blokad doradczych zadań, które w całym klastrze może wykonywać jeden proces
+SENSOR_CHECK_LOCK = "check_sensors_with_data"
+PARTITION_MAINTENANCE_LOCK = "partition_maintenance"
+
+
+def stable_hash(value: str) -> int:
+    """Hash niezależny od procesu (w przeciwieństwie do hash() z losowym ziarnem)."""
+    return int.from_bytes(hashlib.sha256(value.encode()).digest()[:8], "big")
+
+
+def shard_of(sensor_id):
+    """Numer shardu sensora - działa na liczbach i na kolumnach SQLAlchemy."""
+    return sensor_id % settings.COORDINATION_SHARDS
+
+
+class HashRing:
+    """
+    Spójne haszowanie: każdy worker ma wiele punktów (wirtualnych węzłów) na
+    okręgu, a shard należy do pierwszego punktu za swoim hashem. Dołączenie
+    lub odejście workera przenosi tylko część shardów, a nie wszystkie.
+    """
+
+    def __init__(self, nodes: list[str], virtual_nodes: int):
+        points = sorted(
+            (stable_hash(f"{node}#{i}"), node) for node in nodes for i in range(virtual_nodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def owner(self, key) -> str | None:
+        if not self._nodes:
+            return None
+        index = bisect.bisect(self._hashes, stable_hash(str(key))) % len(self._nodes)
+        return self._nodes[index]
+
+
+class AdvisoryLock:
+    """
+    Nieblokująca blokada doradcza Postgresa (pg_try_advisory_lock) na czas zadania.
+    Blokada należy do połączenia, więc po awarii procesu Postgres zwalnia ją sam
+    i zadanie może przejąć inny worker. Połączenie działa w trybie AUTOCOMMIT,
+    żeby przez cały czas zadania nie wisiało "idle in transaction" (i nie
+    zostało zerwane przez idle_in_transaction_session_timeout razem z blokadą).
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.key = stable_hash(name) - 2 ** 63  # klucz musi mieścić się w bigint
+        self._connection = None
+
+    def acquire(self) -> bool:
+        connection = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            acquired = connection.scalar(select(func.pg_try_advisory_lock(self.key)))
+        except Exception:
+            connection.close()
+            raise
+        if not acquired:
+            connection.close()
+            return False
+        self._connection = connection
+        return True
+
+    def release(self) -> None:
+        if self._connection is None:
+            return
+        try:
+            self._connection.scalar(select(func.pg_advisory_unlock(self.key)))
+        finally:
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self) -> bool:
+        return self.acquire()
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+async def run_exclusive(name: str, func: Callable[..., Awaitable], *args):
+    """
+    Uruchamia zadanie asynchroniczne pod blokadą doradczą. Jeśli zadanie trwa
+    już w innym procesie lub replice, zgłasza RuntimeError.
+    """
+    lock = AdvisoryLock(name)
+    if not await asyncio.to_thread(lock.acquire):
+        raise RuntimeError(f"Zadanie {name} jest już wykonywane przez inny proces")
+    try:
+        return await func(*args)
+    finally:
+        await asyncio.to_thread(lock.release)
+
+
+def make_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class IngestionCoordinator:
+    """
+    Podział sensorów na shardy między workery wszystkich replik.
+
+    Każdy worker co COORDINATION_HEARTBEAT_SECONDS zapisuje heartbeat w tabeli
+    ingestion_workers, wyznacza swoje shardy spójnym haszowaniem po żywych
+    workerach i odnawia dzierżawy tych shardów w ingestion_leases. Dzierżawę
+    można przejąć tylko, gdy jest wolna albo wygasła, więc shard ma zawsze co
+    najwyżej jednego właściciela. Worker, który przestał odpowiadać, traci
+    dzierżawy po COORDINATION_LEASE_SECONDS i przejmują je pozostali.
+    """
+
+    def __init__(self):
+        self.worker_id = make_worker_id()
+        self.started_at: datetime | None = None
+        self.shards: frozenset[int] = frozenset()
+
+    def heartbeat(self) -> frozenset[int]:
+        """Zapisuje heartbeat, oddaje shardy innych workerów i odnawia własne dzierżawy."""
+        db = SessionLocal()
+        try:
+            # Czas bazy danych jest wspólny dla wszystkich replik
+            now = db.scalar(select(func.localtimestamp()))
+            lease = timedelta(seconds=settings.COORDINATION_LEASE_SECONDS)
+            self.started_at = self.started_at or now
+
+            stmt = insert(IngestionWorker).values(
+                worker_id=self.worker_id,
+                hostname=socket.gethostname(),
+                pid=os.getpid(),
+                started_at=self.started_at,
+                heartbeat_at=now,
+            )
+            db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[IngestionWorker.worker_id],
+                    set_={"heartbeat_at": stmt.excluded.heartbeat_at},
+                )
+            )
+            db.execute(delete(IngestionWorker).where(IngestionWorker.heartbeat_at < now - lease))
+
+            workers = list(db.scalars(select(IngestionWorker.worker_id)))
+            ring = HashRing(workers, settings.COORDINATION_VIRTUAL_NODES)
+            wanted = [
+                shard
+                for shard in range(settings.COORDINATION_SHARDS)
+                if ring.owner(shard) == self.worker_id
+            ]
+
+            # Shardy przypisane teraz innym workerom oddajemy od razu
+            db.execute(
+                update(IngestionLease)
+                .where(
+                    IngestionLease.holder == self.worker_id,
+                    IngestionLease.shard.not_in(wanted),
+                )
+                .values(holder=None, expires_at=now)
+            )
+
+            held = []
+            if wanted:
+                stmt = insert(IngestionLease).values(
+                    [
+                        {"shard": shard, "holder": self.worker_id, "expires_at": now + lease}
+                        for shard in wanted
+                    ]
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[IngestionLease.shard],
+                    set_={"holder": stmt.excluded.holder, "expires_at": stmt.excluded.expires_at},
+                    where=or_(
+                        IngestionLease.holder == self.worker_id,
+                        IngestionLease.holder.is_(None),
+                        IngestionLease.expires_at < now,
+                    ),
+                ).returning(IngestionLease.shard)
+                held = list(db.execute(stmt).scalars())
+
+            db.commit()
+        finally:
+            db.close()
+
+        self.shards = frozenset(held)
+        return self.shards
+
+    def leave(self) -> None:
+        """Wyrejestrowuje workera i zwalnia jego dzierżawy, żeby inni przejęli je bez czekania."""
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(IngestionLease)
+                .where(IngestionLease.holder == self.worker_id)
+                .values(holder=None, expires_at=func.localtimestamp())
+            )
+            db.execute(delete(IngestionWorker).where(IngestionWorker.worker_id == self.worker_id))
+            db.commit()
+        finally:
+            db.close()
+        self.shards = frozenset()
+
+    def held_shards_query(self):
+        """Podzapytanie o shardy, których dzierżawa tego workera jest ważna w chwili zapytania."""
+        return select(IngestionLease.shard).where(
+            IngestionLease.holder == self.worker_id,
+            IngestionLease.expires_at > func.localtimestamp(),
+        )
+
+
+def coordination_status(db: Session) -> dict:
+    """Zwraca żywe workery z ich shardami oraz shardy bez ważnej dzierżawy."""
+    now = db.scalar(select(func.localtimestamp()))
+    leases = db.execute(select(IngestionLease.shard, IngestionLease.holder, IngestionLease.expires_at)).all()
+
+    shards: dict[str, list[int]] = {}
+    for lease in leases:
+        if lease.holder is not None and lease.expires_at > now:
+            shards.setdefault(lease.holder, []).append(lease.shard)
+
+    workers = [
+        {
+            "worker_id": worker.worker_id,
+            "hostname": worker.hostname,
+            "pid": worker.pid,
+            "started_at": worker.started_at,
+            "heartbeat_at": worker.heartbeat_at,
+            "shards": sorted(shards.get(worker.worker_id, [])),
+        }
+        for worker in db.scalars(select(IngestionWorker).order_by(IngestionWorker.started_at))
+    ]
+    held = {shard for worker_shards in shards.values() for shard in worker_shards}
+    return {
+        "shards": settings.COORDINATION_SHARDS,
+        "workers": workers,
+        "unassigned_shards": [s for s in range(settings.COORDINATION_SHARDS) if s not in held],
+    }
+
+
+coordinator = IngestionCoordinator()
@@ -1,30 +1,79 @@
 from app.config import settings
 from time import sleep
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.engine.base import Engine
 
-connection_engine = None
+POOL_OPTIONS = {
+    "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+    "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+    "pool_pre_ping": True,
+}
 
-while connection_engine is None:
-    try:
-        connection_engine = create_engine(
-            settings.SQLALCHEMY_DATABASE_URL, connect_args={}
-        )
-    except Exception as e:
-        print(f"Error occured when trying to connect to database:\n\n{e}")
 
-        print(f"Retrying in 3s...")
-        sleep(3)
+def async_database_url(url: str) -> str:
+    """
+    Returns the asyncpg variant of a PostgreSQL connection URL.
+    """
+
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
 
-engine: Engine = connection_engine
+# Engines connect lazily - use wait_for_database to check connectivity at startup
+# Pool sizes are part of the connection budget documented in app/config.py
+engine: Engine = create_engine(
+    settings.SQLALCHEMY_DATABASE_URL,
+    pool_size=settings.DB_SYNC_POOL_SIZE,
+    max_overflow=settings.DB_SYNC_MAX_OVERFLOW,
+    **POOL_OPTIONS,
+)
+
+async_engine = create_async_engine(
+    settings.ASYNC_SQLALCHEMY_DATABASE_URL
+    or async_database_url(settings.SQLALCHEMY_DATABASE_URL),
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    **POOL_OPTIONS,
+)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 
+def wait_for_database(
+    retries: int = settings.DB_CONNECT_RETRIES,
+    backoff: float = settings.DB_CONNECT_BACKOFF_SECONDS,
+) -> None:
+    """
+    Function responsible for checking that the database accepts connections.
+    Retries with exponential backoff and re-raises the last error when the
+    database is still unavailable after all attempts.
+    """
+
+    for attempt in range(1, retries + 1):
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            return
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = min(backoff * 2 ** (attempt - 1), settings.DB_CONNECT_BACKOFF_MAX_SECONDS)
+            print(f"Error occured when trying to connect to database:\n\n{e}")
+            print(f"Retrying in {delay:.0f}s... ({attempt}/{retries})")
+            sleep(delay)
+
+
 def get_db():
     """
     Function responsible for giving access to database
@@ -35,3 +84,12 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """
+    Function responsible for giving async access to database
+    """
+
+    async with AsyncSessionLocal() as db:
+        yield db
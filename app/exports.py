@@ -0,0 +1,224 @@
+import csv
+import zlib
+from datetime import datetime
+from io import StringIO
+from typing import Iterator
+from sqlalchemy import select
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Measurement, Sensor, Station
+
+CSV_HEADER = ["timestamp", "station_name", "sensor_name", "sensor_code", "value"]
+
+
+def measurement_rows_query(sensor_ids: list[int], start: datetime, end: datetime):
+    """Jedno zapytanie o pomiary wszystkich wybranych sensorów z danymi stacji."""
+    return (
+        select(
+            Measurement.timestamp,
+            Measurement.value,
+            Measurement.sensor_id,
+            Sensor.code.label("sensor_code"),
+            Sensor.indicator_code,
+            Sensor.indicator_name,
+            Station.code.label("station_code"),
+            Station.name.label("station_name"),
+        )
+        .join(Sensor, Sensor.id == Measurement.sensor_id)
+        .join(Station, Station.code == Sensor.station_code)
+        .where(
+            Measurement.sensor_id.in_(sensor_ids),
+            Measurement.timestamp >= start,
+            Measurement.timestamp <= end,
+        )
+        .order_by(Measurement.sensor_id, Measurement.timestamp)
+    )
+
+
+def measurement_columns_query(sensor_ids: list[int], start: datetime, end: datetime):
+    """Zapytanie o same kolumny pomiarów, bez łączenia z tabelami metadanych."""
+    return (
+        select(Measurement.timestamp, Measurement.sensor_id, Measurement.value)
+        .where(
+            Measurement.sensor_id.in_(sensor_ids),
+            Measurement.timestamp >= start,
+            Measurement.timestamp <= end,
+        )
+        .order_by(Measurement.sensor_id, Measurement.timestamp)
+    )
+
+
+def stream_rows(stmt) -> Iterator[list]:
+    """
+    Zwraca kolejne paczki wierszy pobierane kursorem po stronie serwera.
+    Używa własnej sesji, bo odpowiedź strumieniowa trwa dłużej niż zapytanie HTTP.
+    """
+    db = SessionLocal()
+    try:
+        stmt = stmt.execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+        for rows in db.execute(stmt).partitions():
+            yield rows
+    finally:
+        db.close()
+
+
+def iter_csv(
+    sensor_ids: list[int], start: datetime, end: datetime, compress: bool = False
+) -> Iterator[bytes]:
+    """
+    Generuje raport CSV paczka po paczce, opcjonalnie kompresując go gzipem
+    w locie. Pamięć nie zależy od liczby pomiarów, a nagłówek wysyłany jest
+    zanim baza zwróci pierwszy wiersz.
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None  # 31 - format gzip
+    output = StringIO()
+    writer = csv.writer(output)
+
+    def drain() -> bytes:
+        chunk = output.getvalue().encode()
+        output.seek(0)
+        output.truncate()
+        return compressor.compress(chunk) if compressor else chunk
+
+    writer.writerow(CSV_HEADER)
+    yield drain()
+
+    for rows in stream_rows(measurement_rows_query(sensor_ids, start, end)):
+        writer.writerows(
+            [
+                row.timestamp.isoformat(),
+                row.station_name,
+                row.indicator_name,
+                row.sensor_code,
+                row.value,
+            ]
+            for row in rows
+        )
+        yield drain()
+
+    if compressor:
+        yield compressor.flush()
+
+
+class ChunkSink:
+    """Plik tylko do zapisu, z którego gotowe fragmenty są na bieżąco odbierane."""
+
+    def __init__(self):
+        self.closed = False
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def writable(self) -> bool:
+        return True
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        chunk = b"".join(self._chunks)
+        self._chunks.clear()
+        return chunk
+
+
+def iter_columnar(
+    sensors: list[tuple[int, str, str]],
+    start: datetime,
+    end: datetime,
+    fmt: str = "parquet",
+) -> Iterator[bytes]:
+    """
+    Generuje eksport w formacie Parquet albo Arrow IPC (stream) paczkami rekordów
+    prosto z kursora bazy. Kolumny: timestamp, sensor_id, value oraz station
+    i indicator kodowane słownikowo. Paczki Parquet są buforowane do
+    EXPORT_PARQUET_ROW_GROUP_SIZE wierszy, żeby grupy wierszy nie były drobne.
+        sensors (list): Krotki (sensor_id, kod stacji, kod wskaźnika).
+    """
+    # pyarrow jest potrzebny tylko w tym eksporcie
+    import pyarrow as pa
+
+    station_codes = sorted({station_code for _, station_code, _ in sensors})
+    indicator_codes = sorted({indicator_code for _, _, indicator_code in sensors})
+    station_dictionary = pa.array(station_codes, pa.string())
+    indicator_dictionary = pa.array(indicator_codes, pa.string())
+    station_index = {
+        sensor_id: station_codes.index(station_code)
+        for sensor_id, station_code, _ in sensors
+    }
+    indicator_index = {
+        sensor_id: indicator_codes.index(indicator_code)
+        for sensor_id, _, indicator_code in sensors
+    }
+
+    schema = pa.schema(
+        [
+            ("timestamp", pa.timestamp("ms")),
+            ("sensor_id", pa.int32()),
+            ("value", pa.float64()),
+            ("station", pa.dictionary(pa.int32(), pa.string())),
+            ("indicator", pa.dictionary(pa.int32(), pa.string())),
+        ]
+    )
+
+    sink = ChunkSink()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema)
+
+    row_group_size = settings.EXPORT_PARQUET_ROW_GROUP_SIZE
+    buffered: list = []
+    buffered_rows = 0
+
+    def write_row_group() -> None:
+        writer.write_table(pa.Table.from_batches(buffered, schema), row_group_size=row_group_size)
+        buffered.clear()
+
+    sensor_ids = [sensor_id for sensor_id, _, _ in sensors]
+    for rows in stream_rows(measurement_columns_query(sensor_ids, start, end)):
+        row_sensor_ids = [row.sensor_id for row in rows]
+        batch = pa.record_batch(
+            [
+                pa.array([row.timestamp for row in rows], pa.timestamp("ms")),
+                pa.array(row_sensor_ids, pa.int32()),
+                pa.array([row.value for row in rows], pa.float64()),
+                pa.DictionaryArray.from_arrays(
+                    pa.array([station_index[i] for i in row_sensor_ids], pa.int32()),
+                    station_dictionary,
+                ),
+                pa.DictionaryArray.from_arrays(
+                    pa.array([indicator_index[i] for i in row_sensor_ids], pa.int32()),
+                    indicator_dictionary,
+                ),
+            ],
+            schema=schema,
+        )
+        if fmt == "parquet":
+            buffered.append(batch)
+            buffered_rows += len(rows)
+            if buffered_rows < row_group_size:
+                continue
+            write_row_group()
+            buffered_rows = 0
+        else:
+            writer.write_batch(batch)
+        yield sink.drain()
+
+    if buffered:
+        write_row_group()
+
+    writer.close()
+    yield sink.drain()
@@ -1,11 +1,16 @@
-import requests
 import httpx
 import asyncio
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
-from app.models import Station, Sensor, Measurement
+from app.cache import response_cache, METADATA
+from app.config import settings
+from app.database import SessionLocal
+from app.jobs import Job
+from app.models import Sensor
+from app.metadata_sync import sync_stations, sync_sensors, refresh_station_sensor_counts
+from app.snapshot import metadata_snapshot
+from app.transport import gios_transport
 from datetime import datetime
-from time import sleep
-data = {}
 
 class GiosAPI:
     BASE_URL: str = "https://api.gios.gov.pl/pjp-api/v1/rest"
@@ -18,18 +23,15 @@ class GiosAPI:
         max_page = 1
 
         while page <= max_page:
-            response = requests.get(
+            response_dict = gios_transport.get_json(
                 f"{GiosAPI.BASE_URL}/metadata/sensors?size=500&page={page}"
             )
-            response.raise_for_status()
-            response_dict = response.json()
 
             max_page = response_dict.get("totalPages", 1)
             sensors_data_list.extend(
                 response_dict.get("Lista metadanych stanowisk pomiarowych", [])
             )
             page += 1
-            sleep(31)
 
         return sensors_data_list
 
@@ -41,11 +43,9 @@ class GiosAPI:
         page = 0
         max_page = 1
         while page <= max_page:
-            response = requests.get(
+            response_dict = gios_transport.get_json(
                 f"{GiosAPI.BASE_URL}/metadata/stations?size=500&page={page}"
             )
-            response.raise_for_status()
-            response_dict = response.json()
 
             max_page = response_dict.get("totalPages", 1)
             stations_data_list.extend(
@@ -53,166 +53,177 @@ class GiosAPI:
             )
 
             page += 1
-            sleep(31)
 
         return stations_data_list
 
+    @staticmethod
+    def parse_date(value: str | None):
+        """Zamienia datę z API GIOS (RRRR-MM-DD) na obiekt date."""
+        return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+
     @classmethod
-    def load_stations_to_db(cls, db: Session):
-        """Pobiera i zapisuje stacje do bazy danych."""
-        stations_data = cls.fetch_stations_data()
-
-        for s in stations_data:
-            station = Station(
-                id=int(s.get("Nr")),  # Identyfikator (opcjonalnie, można usunąć)
-                code=s.get("Kod stacji"),
-                name=s.get("Nazwa stacji"),
-                start_date=(
-                    datetime.strptime(s["Data uruchomienia"], "%Y-%m-%d").date()
-                    if s.get("Data uruchomienia")
-                    else None
-                ),
-                end_date=(
-                    datetime.strptime(s["Data zamknięcia"], "%Y-%m-%d").date()
-                    if s.get("Data zamknięcia")
-                    else None
-                ),
-                station_type=s.get("Typ stacji"),
-                area_type=s.get("Typ obszaru"),
-                station_kind=s.get("Rodzaj stacji"),
-                voivodeship=s.get("Województwo"),
-                city=s.get("Miejscowość"),
-                address=s.get("Adres"),
-                latitude=float(s["WGS84 φ N"]) if s.get("WGS84 φ N") else None,
-                longitude=float(s["WGS84 λ E"]) if s.get("WGS84 λ E") else None,
-            )
-            db.merge(station)
-        db.commit()
+    def parse_station(cls, s: dict) -> dict:
+        """Zamienia rekord stacji z API GIOS na słownik kolumn tabeli stations."""
+        return {
+            "id": int(s.get("Nr")),
+            "code": s.get("Kod stacji"),
+            "name": s.get("Nazwa stacji"),
+            "start_date": cls.parse_date(s.get("Data uruchomienia")),
+            "end_date": cls.parse_date(s.get("Data zamknięcia")),
+            "station_type": s.get("Typ stacji"),
+            "area_type": s.get("Typ obszaru"),
+            "station_kind": s.get("Rodzaj stacji"),
+            "voivodeship": s.get("Województwo"),
+            "city": s.get("Miejscowość"),
+            "address": s.get("Adres"),
+            "latitude": float(s["WGS84 φ N"]) if s.get("WGS84 φ N") else None,
+            "longitude": float(s["WGS84 λ E"]) if s.get("WGS84 λ E") else None,
+        }
 
     @classmethod
-    def load_sensors_to_db(cls, db: Session):
-        """Pobiera i zapisuje sensory do bazy danych."""
-        sensors_data = cls.fetch_sensors_data()
-        data = sensors_data
-        for s in sensors_data:
-            sensor_id = int(s.get("Nr"))
-
-            # Sprawdzenie, czy sensor już istnieje
-            if db.query(Sensor).filter_by(id=sensor_id).first():
-                continue  # Pomijamy, jeśli już istnieje
-
-            # Tworzenie nowego obiektu sensora
-            sensor = Sensor(
-                id=sensor_id,
-                code=s.get("Kod stanowiska"),
-                station_code=s.get("Kod stacji"),
-                indicator_code=s.get("Wskaźnik - kod"),
-                indicator_name=s.get("Wskaźnik"),
-                averaging_time=s.get("Czas uśredniania"),
-                measurement_type=s.get("Typ pomiaru"),
-                start_date=(
-                    datetime.strptime(s["Data uruchomienia"], "%Y-%m-%d").date()
-                    if s.get("Data uruchomienia")
-                    else None
-                ),
-                end_date=(
-                    datetime.strptime(s["Data zamknięcia"], "%Y-%m-%d").date()
-                    if s.get("Data zamknięcia")
-                    else None
-                ),
-            )
+    def parse_sensor(cls, s: dict) -> dict:
+        """Zamienia rekord stanowiska z API GIOS na słownik kolumn tabeli sensors."""
+        return {
+            "id": int(s.get("Nr")),
+            "code": s.get("Kod stanowiska"),
+            "station_code": s.get("Kod stacji"),
+            "indicator_code": s.get("Wskaźnik - kod"),
+            "indicator_name": s.get("Wskaźnik"),
+            "averaging_time": s.get("Czas uśredniania"),
+            "measurement_type": s.get("Typ pomiaru"),
+            "start_date": cls.parse_date(s.get("Data uruchomienia")),
+            "end_date": cls.parse_date(s.get("Data zamknięcia")),
+        }
 
-            db.add(sensor)  # Dodajemy tylko jeśli nie istnieje
+    @classmethod
+    def load_stations_to_db(cls, db: Session) -> dict:
+        """Pobiera stacje i synchronizuje je z bazą danych."""
+        stations = [cls.parse_station(s) for s in cls.fetch_stations_data()]
+        return sync_stations(db, stations)
 
-            db.commit()
+    @classmethod
+    def load_sensors_to_db(cls, db: Session) -> dict:
+        """Pobiera sensory i synchronizuje je z bazą danych."""
+        sensors = [cls.parse_sensor(s) for s in cls.fetch_sensors_data()]
+        return sync_sensors(db, sensors)
 
     @staticmethod
-    async def check_sensors_with_data(db: Session):
-        """Sprawdza sensory od 1 do N i oznacza jako aktywne te, które mają dane."""
-        sensor_count = db.query(Sensor).count()
-        sensor_ids = range(1, sensor_count + 669)  # Można to później poprawić
-
-        sem = asyncio.Semaphore(25)
-
-        async with httpx.AsyncClient(timeout=10) as client:
-            for i in range(0, len(sensor_ids), 25):
-                batch = sensor_ids[i:i+25]
-                tasks = [
-                    GiosAPI.fetch_sensor_status(sensor_id, client, sem)
-                    for sensor_id in batch
-                ]
-                results = await asyncio.gather(*tasks)
-                active_sensor_ids = list(filter(None, results))
-
-                for sensor_id in active_sensor_ids:
-                    sensor = db.query(Sensor).filter_by(id=sensor_id).first()
-                    if sensor:
-                        sensor.is_active = True
-                        sensor.measurement_type = "automatyczny"
-                        sensor.end_date = None
-                        sensor.averaging_time = "1-godzinny"
-                        print(f"[✓] Sensor aktywny: {sensor_id}")
-                db.commit()
-
-                await asyncio.sleep(1)
-                
+    def load_sensor_states() -> dict[int, bool]:
+        """Zwraca stan aktywności znanych sensorów, najpierw ostatnio aktywne."""
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(Sensor.id, Sensor.is_active).order_by(
+                    Sensor.is_active.desc().nulls_last(), Sensor.id
+                )
+            )
+            return {row.id: bool(row.is_active) for row in rows}
+        finally:
+            db.close()
+
     @staticmethod
-    async def fetch_sensor_status(sensor_id: int, client: httpx.AsyncClient, sem: asyncio.Semaphore):
-        """Sprawdza, czy sensor ma dane pomiarowe i zwraca jego ID jeśli tak."""
-        url = f"{GiosAPI.BASE_URL}/data/getData/{sensor_id}"
+    def apply_sensor_states(activated: list[int], deactivated: list[int]) -> None:
+        """Zapisuje zmiany aktywności sensorów dwoma zapytaniami w jednej transakcji."""
+        db = SessionLocal()
+        try:
+            if activated:
+                db.execute(
+                    update(Sensor)
+                    .where(Sensor.id.in_(activated))
+                    .values(
+                        is_active=True,
+                        measurement_type="automatyczny",
+                        end_date=None,
+                        averaging_time="1-godzinny",
+                    )
+                )
+            if deactivated:
+                db.execute(
+                    update(Sensor)
+                    .where(Sensor.id.in_(deactivated))
+                    .values(is_active=False)
+                )
+            refresh_station_sensor_counts(db)
+            db.commit()
+            response_cache.bump(METADATA)
+            metadata_snapshot.reload(db)
+        finally:
+            db.close()
 
-        async with sem:
-            try:
-                response = await client.get(url)
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get("Lista danych pomiarowych"):
-                        return sensor_id  # Sensor aktywny
-            except Exception as e:
-                print(f"[{sensor_id}] Błąd: {e}")
-        return None
-    
     @classmethod
-    def fetch_measurement_data_for_sensors(cls, sensor_ids: list[int], db: Session):
+    async def check_sensors_with_data(cls, job: Job | None = None) -> dict:
         """
-        Pobiera dane pomiarowe dla listy sensorów i zapisuje je w bazie danych.
-            sensor_ids (list[int]): Lista identyfikatorów sensorów.
-            db (Session): Sesja bazy danych SQLAlchemy.
-        Metoda iteruje przez podane identyfikatory sensorów, pobiera dane z API GIOS
-        i zapisuje je w bazie danych, unikając duplikatów.
+        Sprawdza znane sensory i oznacza jako aktywne te, które mają dane.
+        Najpierw sprawdzane są sensory ostatnio aktywne. Zmiany są zapisywane
+        na końcu, tylko dla sensorów, których stan się zmienił. Sensory, których
+        nie udało się sprawdzić, zachowują dotychczasowy stan.
         """
+        states = await asyncio.to_thread(cls.load_sensor_states)
+        if job:
+            job.total = len(states)
 
-        url = f"{cls.BASE_URL}/data/getData/"
-        for sensor_id in sensor_ids:
-            response = requests.get(f"{url}{sensor_id}")
-            data = response.json()
+        async with httpx.AsyncClient(timeout=settings.GIOS_TIMEOUT_SECONDS) as client:
 
-            measurement_list = data.get("Lista danych pomiarowych", [])
-            for item in measurement_list:
-                sensor_code = item.get("Kod stanowiska")
-                timestamp_str = item.get("Data")
-                value = item.get("Wartość")
+            async def probe(sensor_id: int) -> tuple[int, bool | None]:
+                has_data = await cls.fetch_sensor_status(sensor_id, client)
+                if job:
+                    job.progress += 1
+                return sensor_id, has_data
 
-                if value is None:
-                    continue  # pomiń brakujące dane
+            results = await asyncio.gather(*(probe(sensor_id) for sensor_id in states))
 
-                timestamp = datetime.fromisoformat(timestamp_str)
+        activated = [i for i, has_data in results if has_data is True and not states[i]]
+        deactivated = [i for i, has_data in results if has_data is False and states[i]]
+        await asyncio.to_thread(cls.apply_sensor_states, activated, deactivated)
 
-                # Sprawdź, czy już istnieje taki pomiar
-                existing = (
-                    db.query(Measurement)
-                    .filter_by(timestamp=timestamp, sensor_id=sensor_id)
-                    .first()
-                )
-                if existing:
-                    continue  # już mamy ten pomiar
-
-                # Dodaj nowy pomiar
-                measurement = Measurement(
-                    timestamp=timestamp,
-                    value=value,
-                    sensor_id=sensor_id,
-                )
-                db.add(measurement)
+        return {
+            "checked": len(states),
+            "active": sum(1 for _, has_data in results if has_data),
+            "failed": sum(1 for _, has_data in results if has_data is None),
+            "activated": len(activated),
+            "deactivated": len(deactivated),
+        }
+
+    @staticmethod
+    async def fetch_sensor_status(sensor_id: int, client: httpx.AsyncClient) -> bool | None:
+        """
+        Sprawdza, czy sensor ma dane pomiarowe.
+        Zwraca None, jeśli nie udało się tego ustalić.
+        """
+        url = f"{GiosAPI.BASE_URL}/data/getData/{sensor_id}"
+
+        try:
+            response = await gios_transport.get_async(url, client)
+            if response.status_code == 200:
+                data = response.json()
+                return bool(data.get("Lista danych pomiarowych"))
+            if response.status_code in (400, 404):
+                return False
+        except Exception as e:
+            print(f"[{sensor_id}] Błąd: {e}")
+        return None
 
-            db.commit()
\ No newline at end of file
+    @staticmethod
+    def parse_measurements(sensor_id: int, data: dict) -> list[dict]:
+        """Zamienia odpowiedź API GIOS na wiersze pomiarów gotowe do zapisu."""
+        rows = []
+        for item in data.get("Lista danych pomiarowych", []):
+            value = item.get("Wartość")
+            if value is None:
+                continue  # pomiń brakujące dane
+
+            rows.append(
+                {
+                    "sensor_id": sensor_id,
+                    "timestamp": datetime.fromisoformat(item.get("Data")),
+                    "value": value,
+                }
+            )
+        return rows
+
+    @classmethod
+    async def fetch_measurements(cls, sensor_id: int, client: httpx.AsyncClient) -> dict:
+        """Pobiera surową odpowiedź z danymi pomiarowymi dla jednego sensora."""
+        return await gios_transport.get_json_async(
+            f"{cls.BASE_URL}/data/getData/{sensor_id}", client
+        )
@@ -0,0 +1,303 @@
+import asyncio
+import httpx
+from time import perf_counter
+from datetime import datetime
+from sqlalchemy import DateTime, Float, Integer, column, func, text, tuple_, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.cache import response_cache, MEASUREMENTS
+from app.config import settings
+from app.database import SessionLocal
+from app.gios_api import GiosAPI
+from app.models import Measurement, SensorWatermark
+from app.rollups import refresh_rollups
+
+# Postgres przyjmuje maksymalnie 65535 parametrów w jednym zapytaniu,
+# a każdy wiersz pomiaru to 3 parametry.
+MAX_ROWS_PER_STATEMENT = 5000
+
+
+def empty_stats() -> dict:
+    """Zwraca pusty słownik liczników zapisu pomiarów."""
+    return {"inserted": 0, "updated": 0, "skipped": 0}
+
+
+def upsert_measurements(db: Session, rows: list[dict]) -> tuple[dict, list[tuple]]:
+    """
+    Zapisuje pomiary paczkami: wielowierszowy INSERT ... ON CONFLICT DO NOTHING
+    dodaje nowe pomiary, a jeden UPDATE ... FROM (VALUES ...) poprawia tylko te
+    istniejące, których wartość GIOS skorygował.
+        db (Session): Sesja bazy danych SQLAlchemy.
+        rows (list[dict]): Wiersze z kluczami sensor_id, timestamp i value.
+    Zwraca liczniki inserted, updated i skipped oraz klucze (sensor_id,
+    timestamp) dodanych lub zmienionych pomiarów. Nie korzysta z kolumn
+    systemowych (xmax), więc działa także na tabeli partycjonowanej.
+    Nie wykonuje commit - transakcją zarządza wywołujący.
+    """
+    stats = empty_stats()
+    changed_keys = []
+
+    # Ten sam klucz dwa razy w jednym INSERT ... ON CONFLICT DO UPDATE
+    # kończy się błędem, więc zostawiamy ostatnią wartość.
+    unique_rows = list({(r["sensor_id"], r["timestamp"]): r for r in rows}.values())
+    stats["skipped"] += len(rows) - len(unique_rows)
+
+    for start in range(0, len(unique_rows), MAX_ROWS_PER_STATEMENT):
+        chunk = unique_rows[start : start + MAX_ROWS_PER_STATEMENT]
+
+        stmt = (
+            insert(Measurement)
+            .values(chunk)
+            .on_conflict_do_nothing(constraint="uq_measurements_sensor_timestamp")
+            .returning(Measurement.sensor_id, Measurement.timestamp)
+        )
+        inserted = {tuple(row) for row in db.execute(stmt)}
+
+        existing = [
+            (row["sensor_id"], row["timestamp"], row["value"])
+            for row in chunk
+            if (row["sensor_id"], row["timestamp"]) not in inserted
+        ]
+        updated = []
+        if existing:
+            incoming = values(
+                column("sensor_id", Integer),
+                column("timestamp", DateTime),
+                column("value", Float),
+                name="incoming",
+            ).data(existing)
+            stmt = (
+                update(Measurement)
+                .where(
+                    tuple_(Measurement.sensor_id, Measurement.timestamp)
+                    == tuple_(incoming.c.sensor_id, incoming.c.timestamp),
+                    Measurement.value.is_distinct_from(incoming.c.value),
+                )
+                .values(value=incoming.c.value)
+                .returning(Measurement.sensor_id, Measurement.timestamp)
+            )
+            updated = [tuple(row) for row in db.execute(stmt)]
+
+        changed_keys.extend(inserted)
+        changed_keys.extend(updated)
+
+        stats["inserted"] += len(inserted)
+        stats["updated"] += len(updated)
+        stats["skipped"] += len(existing) - len(updated)
+
+    return stats, changed_keys
+
+
+def latest_timestamps(rows: list[dict]) -> dict[int, datetime]:
+    """Zwraca najnowszy znacznik czasu dla każdego sensora w wierszach."""
+    latest = {}
+    for row in rows:
+        if row["timestamp"] > latest.get(row["sensor_id"], datetime.min):
+            latest[row["sensor_id"]] = row["timestamp"]
+    return latest
+
+
+def load_watermarks(sensor_ids: list[int]) -> dict[int, datetime]:
+    """
+    Wczytuje znaczniki sensorów z tabeli sensor_watermarks jednym zapytaniem
+    po kluczu głównym. Znaczniki są czytane na nowo przy każdym pobieraniu,
+    więc wyczyszczenie bazy w dowolnym procesie działa od razu we wszystkich.
+    """
+    db = SessionLocal()
+    try:
+        watermarks = db.query(SensorWatermark).filter(
+            SensorWatermark.sensor_id.in_(sensor_ids)
+        )
+        return {watermark.sensor_id: watermark.last_timestamp for watermark in watermarks}
+    finally:
+        db.close()
+
+
+def filter_new_measurements(watermark: datetime | None, rows: list[dict]) -> list[dict]:
+    """Odrzuca pomiary nie nowsze niż znacznik sensora."""
+    if watermark is None:
+        return rows
+    return [row for row in rows if row["timestamp"] > watermark]
+
+
+def upsert_watermarks(db: Session, latest: dict[int, datetime]) -> None:
+    """Przesuwa znaczniki sensorów w tej samej transakcji co zapis pomiarów."""
+    if not latest:
+        return
+
+    stmt = insert(SensorWatermark).values(
+        [
+            {"sensor_id": sensor_id, "last_timestamp": timestamp}
+            for sensor_id, timestamp in latest.items()
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SensorWatermark.sensor_id],
+        set_={
+            "last_timestamp": func.greatest(
+                SensorWatermark.last_timestamp, stmt.excluded.last_timestamp
+            )
+        },
+    )
+    db.execute(stmt)
+
+
+# Najnowszy pomiar każdego sensora wyszukiwany po indeksie (sensor_id, timestamp)
+REFRESH_LATEST_MEASUREMENTS = text(
+    """
+    INSERT INTO latest_measurements (sensor_id, measurement_id, timestamp, value)
+    SELECT m.sensor_id, m.id, m.timestamp, m.value
+    FROM unnest(CAST(:sensor_ids AS integer[])) AS s(sensor_id)
+    CROSS JOIN LATERAL (
+        SELECT id, sensor_id, timestamp, value
+        FROM measurements
+        WHERE measurements.sensor_id = s.sensor_id
+        ORDER BY timestamp DESC
+        LIMIT 1
+    ) AS m
+    ON CONFLICT (sensor_id) DO UPDATE SET
+        measurement_id = EXCLUDED.measurement_id,
+        timestamp = EXCLUDED.timestamp,
+        value = EXCLUDED.value
+    WHERE (latest_measurements.measurement_id, latest_measurements.value)
+        IS DISTINCT FROM (EXCLUDED.measurement_id, EXCLUDED.value)
+    """
+)
+
+
+def refresh_latest_measurements(db: Session, sensor_ids: list[int]) -> None:
+    """Aktualizuje tabelę latest_measurements dla podanych sensorów."""
+    if sensor_ids:
+        db.execute(REFRESH_LATEST_MEASUREMENTS, {"sensor_ids": list(sensor_ids)})
+
+
+def write_measurements(rows: list[dict]) -> dict:
+    """Zapisuje paczkę pomiarów w osobnej sesji i jednej transakcji."""
+    latest = latest_timestamps(rows)
+    db = SessionLocal()
+    try:
+        stats, changed = upsert_measurements(db, rows)
+        upsert_watermarks(db, latest)
+        refresh_latest_measurements(db, list(latest))
+        refresh_rollups(db, changed)
+        db.commit()
+        return stats
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def ingest_measurements(
+    sensor_ids: list[int],
+    concurrency: int | None = None,
+    queue_size: int | None = None,
+    batch_size: int | None = None,
+) -> dict:
+    """
+    Pobiera i zapisuje pomiary dla listy sensorów w trzech etapach.
+        sensor_ids (list[int]): Lista identyfikatorów sensorów.
+        concurrency (int): Liczba równoległych zapytań do API GIOS.
+        queue_size (int): Maksymalna liczba odpowiedzi czekających na zapis.
+        batch_size (int): Liczba sensorów zapisywanych jedną transakcją.
+    Pobieranie działa współbieżnie na wspólnym httpx.AsyncClient, odpowiedzi
+    trafiają do ograniczonej kolejki, a etap zapisu parsuje je i zapisuje paczkami.
+    Gdy baza nie nadąża, kolejka się zapełnia i wstrzymuje pobieranie.
+    Pomiary nie nowsze niż znacznik sensora są odrzucane przed zapisem.
+    """
+    concurrency = concurrency or settings.INGEST_CONCURRENCY
+    queue_size = queue_size or settings.INGEST_QUEUE_SIZE
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+
+    started = perf_counter()
+    stats = {
+        **empty_stats(),
+        "sensors": len(sensor_ids),
+        "unchanged_sensors": 0,
+        "errors": {},
+    }
+
+    watermarks = await asyncio.to_thread(load_watermarks, sensor_ids)
+
+    pending: asyncio.Queue[int] = asyncio.Queue()
+    for sensor_id in sensor_ids:
+        pending.put_nowait(sensor_id)
+
+    fetched: asyncio.Queue[tuple[int, dict] | None] = asyncio.Queue(maxsize=queue_size)
+
+    async def fetch(client: httpx.AsyncClient) -> None:
+        while True:
+            try:
+                sensor_id = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            try:
+                payload = await GiosAPI.fetch_measurements(sensor_id, client)
+            except Exception as e:
+                print(f"[{sensor_id}] Błąd: {e}")
+                stats["errors"][sensor_id] = str(e)
+                continue
+
+            # Czeka, jeśli etap zapisu nie nadąża
+            await fetched.put((sensor_id, payload))
+
+    async def flush(batch_sensor_ids: list[int], rows: list[dict]) -> None:
+        if not batch_sensor_ids:
+            return
+        try:
+            batch_stats = await asyncio.to_thread(write_measurements, rows)
+        except Exception as e:
+            print(f"[{batch_sensor_ids}] Błąd zapisu: {e}")
+            for sensor_id in batch_sensor_ids:
+                stats["errors"][sensor_id] = str(e)
+            return
+
+        for key, count in batch_stats.items():
+            stats[key] += count
+
+        if batch_stats["inserted"] or batch_stats["updated"]:
+            response_cache.bump(MEASUREMENTS)
+
+    async def write() -> None:
+        batch_sensor_ids, rows = [], []
+        while (item := await fetched.get()) is not None:
+            sensor_id, payload = item
+            try:
+                parsed = GiosAPI.parse_measurements(sensor_id, payload)
+            except Exception as e:
+                print(f"[{sensor_id}] Błąd parsowania: {e}")
+                stats["errors"][sensor_id] = str(e)
+                continue
+
+            new_rows = filter_new_measurements(watermarks.get(sensor_id), parsed)
+            stats["skipped"] += len(parsed) - len(new_rows)
+            if not new_rows:
+                # Nic nowego od ostatniego cyklu - sensor nie trafia do bazy
+                stats["unchanged_sensors"] += 1
+                continue
+
+            rows.extend(new_rows)
+            batch_sensor_ids.append(sensor_id)
+
+            if len(batch_sensor_ids) >= batch_size:
+                await flush(batch_sensor_ids, rows)
+                batch_sensor_ids, rows = [], []
+
+        await flush(batch_sensor_ids, rows)
+
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    async with httpx.AsyncClient(timeout=settings.GIOS_TIMEOUT_SECONDS, limits=limits) as client:
+        writer = asyncio.create_task(write())
+        try:
+            await asyncio.gather(*(fetch(client) for _ in range(concurrency)))
+            await fetched.put(None)
+            await writer
+        finally:
+            writer.cancel()
+
+    stats["duration_seconds"] = round(perf_counter() - started, 2)
+    return stats
@@ -0,0 +1,201 @@
+import asyncio
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from app.config import settings
+from app.database import SessionLocal
+from app.models import BackgroundJob
+
+# Liczba zakończonych zadań przechowywanych w pamięci procesu
+MAX_JOBS = 100
+# Zadanie bez heartbeatu przez tyle cykli uznajemy za przerwane (proces zakończył działanie)
+LOST_AFTER_HEARTBEATS = 3
+
+
+class Job:
+    """Zadanie działające w tle wraz z postępem i wynikiem."""
+
+    def __init__(self, kind: str, total: int | None = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "pending"
+        self.progress = 0
+        self.total = total
+        self.result = None
+        self.error: str | None = None
+        self.created_at = datetime.now()
+        self.finished_at: datetime | None = None
+
+    def __repr__(self):
+        return f"Job({self.id}, {self.kind}, {self.status}, {self.progress}/{self.total})"
+
+    @classmethod
+    def from_row(cls, row: BackgroundJob) -> "Job":
+        """Odtwarza zadanie zapisane w bazie (np. uruchomione przez inny proces)."""
+        job = cls.__new__(cls)
+        job.id = row.id
+        job.kind = row.kind
+        job.status = row.status
+        job.progress = row.progress
+        job.total = row.total
+        job.result = row.result
+        job.error = row.error
+        job.created_at = row.created_at
+        job.finished_at = row.finished_at
+
+        lost_after = timedelta(seconds=settings.JOB_HEARTBEAT_SECONDS * LOST_AFTER_HEARTBEATS)
+        if job.status in ("pending", "running") and datetime.now() - row.heartbeat_at > lost_after:
+            job.status = "failed"
+            job.error = "Zadanie przerwane - proces, który je wykonywał, przestał działać"
+            job.finished_at = row.heartbeat_at
+        return job
+
+
+# Zadania tego procesu - aktualny postęp bez odczytu z bazy
+_jobs: OrderedDict[str, Job] = OrderedDict()
+_tasks: set[asyncio.Task] = set()
+
+
+def save_job(job: Job) -> None:
+    """
+    Zapisuje stan zadania w tabeli background_jobs, dzięki czemu jest widoczny
+    we wszystkich workerach i replikach. Przy okazji usuwa zakończone zadania
+    starsze niż JOB_RETENTION_DAYS.
+    """
+    now = datetime.now()
+    values = {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "total": job.total,
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+        "heartbeat_at": now,
+    }
+    stmt = insert(BackgroundJob).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[BackgroundJob.id],
+        set_={key: value for key, value in values.items() if key not in ("id", "created_at")},
+    )
+
+    db = SessionLocal()
+    try:
+        db.execute(stmt)
+        if job.finished_at is not None:
+            db.execute(
+                delete(BackgroundJob).where(
+                    BackgroundJob.finished_at < now - timedelta(days=settings.JOB_RETENTION_DAYS)
+                )
+            )
+        db.commit()
+    finally:
+        db.close()
+
+
+def load_job(job_id: str) -> Job | None:
+    db = SessionLocal()
+    try:
+        row = db.get(BackgroundJob, job_id)
+        return Job.from_row(row) if row else None
+    finally:
+        db.close()
+
+
+def get_job(job_id: str) -> Job | None:
+    """Zwraca zadanie tego procesu, a jeśli go nie ma - zapisane w bazie."""
+    job = _jobs.get(job_id)
+    if job is not None:
+        return job
+    return load_job(job_id)
+
+
+def find_running_job(kind: str) -> Job | None:
+    """Zwraca trwające zadanie danego rodzaju, także uruchomione w innym procesie."""
+    for job in _jobs.values():
+        if job.kind == kind and job.status in ("pending", "running"):
+            return job
+
+    db = SessionLocal()
+    try:
+        rows = db.scalars(
+            select(BackgroundJob)
+            .where(BackgroundJob.kind == kind, BackgroundJob.status.in_(("pending", "running")))
+            .order_by(BackgroundJob.created_at.desc())
+        )
+        for row in rows:
+            job = Job.from_row(row)
+            if job.status in ("pending", "running"):
+                return job
+        return None
+    finally:
+        db.close()
+
+
+def register_job(job: Job) -> Job:
+    _jobs[job.id] = job
+
+    while len(_jobs) > MAX_JOBS:
+        oldest = next(iter(_jobs.values()))
+        if oldest.status in ("pending", "running"):
+            break
+        _jobs.popitem(last=False)
+    return job
+
+
+async def finished_job(kind: str, result) -> Job:
+    """Rejestruje zadanie, którego wynik jest już znany (np. z pamięci podręcznej)."""
+    job = Job(kind)
+    job.status = "done"
+    job.result = result
+    job.finished_at = job.created_at
+    await asyncio.to_thread(save_job, job)
+    return register_job(job)
+
+
+async def _save_progress(job: Job) -> None:
+    """Co JOB_HEARTBEAT_SECONDS zapisuje postęp zadania - zapis jest też heartbeatem."""
+    while True:
+        await asyncio.sleep(settings.JOB_HEARTBEAT_SECONDS)
+        try:
+            await asyncio.to_thread(save_job, job)
+        except Exception as e:
+            print(f"Błąd zapisu stanu zadania {job.id}: {e}")
+
+
+async def start_job(kind: str, func: Callable[[Job], Awaitable]) -> Job:
+    """
+    Tworzy zadanie, zapisuje je w bazie i uruchamia w tle w bieżącej pętli
+    zdarzeń. Stan zadania jest odczytywalny z każdego procesu przez get_job.
+    """
+    job = Job(kind)
+    await asyncio.to_thread(save_job, job)
+    register_job(job)
+
+    async def run():
+        job.status = "running"
+        progress = asyncio.create_task(_save_progress(job))
+        try:
+            job.result = await func(job)
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            progress.cancel()
+            job.finished_at = datetime.now()
+            try:
+                await asyncio.to_thread(save_job, job)
+            except Exception as e:
+                print(f"Błąd zapisu stanu zadania {job.id}: {e}")
+
+    # Trzymamy referencję, żeby zadanie nie zostało usunięte przez GC
+    task = asyncio.create_task(run())
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return job
@@ -1,29 +1,59 @@
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi_pagination import add_pagination
-from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine
+from app.database import engine, async_engine, wait_for_database
 from app.router import router as router_api
 from app.admin import create_admin
-from app.database import Base
+from app.cache import ResponseCacheMiddleware
+from app.config import settings
+from app.migrations import migrate
+from app.scheduler import scheduler
+from app.reports import shutdown_pool
+from app.snapshot import metadata_snapshot
 
+# Modules that only report/export endpoints need - they must not load at startup
+HEAVY_MODULES = ("matplotlib", "numpy", "reportlab", "pyarrow")
 
-def create_db() -> None:
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
     """
-    Function responsible for creating the database.
+    Checks the database connection (and migrates the schema when
+    MIGRATE_ON_STARTUP is set), loads the metadata snapshot, starts the
+    measurement ingestion scheduler for the lifetime of the app and shuts
+    down the report rendering pool on exit.
     """
 
-    # Create the database
-    Base.metadata.create_all(bind=engine)
+    await asyncio.to_thread(wait_for_database)
+    if settings.MIGRATE_ON_STARTUP:
+        await asyncio.to_thread(migrate, engine)
+
+    await asyncio.to_thread(metadata_snapshot.reload)
+    await scheduler.start()
+    yield
+    await scheduler.stop()
+    shutdown_pool()
+    await async_engine.dispose()
 
 
 def get_configured_server_app() -> FastAPI:
-    app = FastAPI(swagger_ui_parameters={"syntaxHighlight.theme": "obsidian"})
+    app = FastAPI(
+        lifespan=lifespan,
+        swagger_ui_parameters={"syntaxHighlight.theme": "obsidian"},
+    )
 
     add_pagination(app)
 
     app.include_router(router_api)
 
+    app.add_middleware(ResponseCacheMiddleware)
+
     app.add_middleware(
         CORSMiddleware,
         allow_origins=[
@@ -34,15 +64,90 @@ def get_configured_server_app() -> FastAPI:
         allow_headers=["*"],
     )
 
-    create_db()
     create_admin(app=app, engine=engine)
 
     return app
 
 
-server_app = get_configured_server_app()
+def __getattr__(name: str):
+    """
+    Builds `server_app` on first access, so importing this module
+    (e.g. by tooling or the migration command) does not configure the app.
+    """
+
+    if name == "server_app":
+        app = get_configured_server_app()
+        globals()["server_app"] = app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def profile_startup(top: int = 15) -> int:
+    """
+    Measures imports needed to build the app in a fresh interpreter
+    (python -X importtime) and prints the slowest top-level imports.
+    Returns 1 when any of HEAVY_MODULES is imported at startup.
+    """
+
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [os.path.dirname(app_dir), env.get("PYTHONPATH")])
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main; main.get_configured_server_app()"],
+        capture_output=True,
+        text=True,
+        cwd=app_dir,
+        env=env,
+    )
+    if result.returncode != 0:
+        print(result.stderr)
+        return result.returncode
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue
+        # Top-level imports have a single space of indentation
+        imports.append((int(cumulative), name[1:], not name[1:].startswith(" ")))
+
+    total = sum(cumulative for cumulative, _, top_level in imports if top_level)
+    print(f"Startup imports: {len(imports)} modules, {total / 1000:.0f} ms")
+    for cumulative, name, _ in sorted(imports, reverse=True)[:top]:
+        print(f"{cumulative / 1000:10.1f} ms  {name.strip()}")
+
+    loaded = {name.strip().split(".")[0] for _, name, _ in imports}
+    heavy = [module for module in HEAVY_MODULES if module in loaded]
+    if heavy:
+        print(f"[✗] Heavy modules imported at startup: {', '.join(heavy)}")
+        return 1
+    print("[✓] No heavy modules imported at startup")
+    return 0
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Air quality API server")
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Measure import time of the app and exit",
+    )
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        sys.exit(profile_startup())
+
     import uvicorn
 
-    uvicorn.run("main:server_app", host="0.0.0.0", port=8000, reload=True, workers=2)
+    uvicorn.run(
+        "main:get_configured_server_app",
+        factory=True,
+        host="0.0.0.0",
+        port=8000,
+        reload=True,
+        workers=2,
+    )
@@ -0,0 +1,181 @@
+import hashlib
+from datetime import date
+from sqlalchemy import insert, select, update, text
+from sqlalchemy.orm import Session
+from app.cache import response_cache, METADATA
+from app.models import Station, Sensor
+from app.snapshot import metadata_snapshot
+
+STATION_COLUMNS = [
+    "code",
+    "name",
+    "start_date",
+    "end_date",
+    "station_type",
+    "area_type",
+    "station_kind",
+    "voivodeship",
+    "city",
+    "address",
+    "latitude",
+    "longitude",
+]
+
+SENSOR_COLUMNS = [
+    "code",
+    "station_code",
+    "indicator_code",
+    "indicator_name",
+    "averaging_time",
+    "measurement_type",
+    "start_date",
+    "end_date",
+]
+
+# Pola nadpisywane przez sprawdzanie aktywności sensorów - dla aktywnych
+# sensorów synchronizacja metadanych ich nie zmienia.
+SENSOR_STATUS_COLUMNS = ["averaging_time", "measurement_type", "end_date"]
+
+REFRESH_STATION_SENSOR_COUNTS = text(
+    """
+    UPDATE stations
+    SET count_working_sensors = counts.working
+    FROM (
+        SELECT stations.code, count(sensors.id) AS working
+        FROM stations
+        LEFT JOIN sensors
+            ON sensors.station_code = stations.code
+            AND sensors.is_active
+            AND sensors.measurement_type = 'automatyczny'
+        GROUP BY stations.code
+    ) AS counts
+    WHERE stations.code = counts.code
+      AND stations.count_working_sensors IS DISTINCT FROM counts.working
+    """
+)
+
+
+def refresh_station_sensor_counts(db: Session) -> None:
+    """
+    Przelicza jednym zapytaniem liczbę aktywnych czujników automatycznych stacji.
+    Nie wykonuje commit - transakcją zarządza wywołujący.
+    """
+    db.execute(REFRESH_STATION_SENSOR_COUNTS)
+
+
+def record_hash(record: dict, columns: list[str]) -> str:
+    """Zwraca skrót zawartości rekordu dla podanych kolumn."""
+    content = repr(tuple(record.get(column) for column in columns))
+    return hashlib.sha1(content.encode()).hexdigest()
+
+
+def diff_records(
+    existing: dict[int, dict], incoming: list[dict], columns: list[str]
+) -> tuple[list[dict], list[dict], list[int], int]:
+    """
+    Porównuje rekordy z API z rekordami w bazie.
+    Zwraca rekordy do dodania, rekordy do aktualizacji, identyfikatory rekordów,
+    których nie ma już w API, oraz liczbę rekordów bez zmian.
+    """
+    inserts, updates, unchanged = [], [], 0
+    incoming_ids = set()
+
+    for record in incoming:
+        incoming_ids.add(record["id"])
+        current = existing.get(record["id"])
+
+        if current is None:
+            inserts.append(record)
+        elif record_hash(record, columns) != record_hash(current, columns):
+            updates.append({"id": record["id"], **{c: record.get(c) for c in columns}})
+        else:
+            unchanged += 1
+
+    missing = [record_id for record_id in existing if record_id not in incoming_ids]
+    return inserts, updates, missing, unchanged
+
+
+def load_existing(db: Session, model, columns: list[str]) -> dict[int, dict]:
+    """Wczytuje jednym zapytaniem aktualną zawartość tabeli."""
+    rows = db.execute(select(model.id, *(getattr(model, c) for c in columns)))
+    return {row.id: dict(row._mapping) for row in rows.all()}
+
+
+def sync_stations(db: Session, stations: list[dict]) -> dict:
+    """
+    Synchronizuje tabelę stacji z listą stacji z API GIOS w jednej transakcji.
+    Stacje, których nie ma już w API, dostają datę zamknięcia.
+    """
+    if not stations:
+        raise ValueError("API GIOS zwróciło pustą listę stacji")
+
+    existing = load_existing(db, Station, STATION_COLUMNS)
+    inserts, updates, missing, unchanged = diff_records(existing, stations, STATION_COLUMNS)
+    retired = [i for i in missing if existing[i]["end_date"] is None]
+
+    if inserts:
+        db.execute(insert(Station), inserts)
+    if updates:
+        db.execute(update(Station), updates)
+    if retired:
+        db.execute(
+            update(Station).where(Station.id.in_(retired)).values(end_date=date.today())
+        )
+    db.commit()
+    response_cache.bump(METADATA)
+    metadata_snapshot.reload(db)
+
+    return {
+        "inserted": len(inserts),
+        "updated": len(updates),
+        "retired": len(retired),
+        "unchanged": unchanged,
+    }
+
+
+def sync_sensors(db: Session, sensors: list[dict]) -> dict:
+    """
+    Synchronizuje tabelę sensorów z listą stanowisk z API GIOS w jednej transakcji.
+    Sensory, których nie ma już w API, są wyłączane i dostają datę zamknięcia.
+    Sensory przypisane do nieznanych stacji są pomijane.
+    """
+    if not sensors:
+        raise ValueError("API GIOS zwróciło pustą listę stanowisk pomiarowych")
+
+    station_codes = set(db.execute(select(Station.code)).scalars())
+    known = [s for s in sensors if s["station_code"] in station_codes]
+
+    existing = load_existing(db, Sensor, SENSOR_COLUMNS + ["is_active"])
+    for record in known:
+        current = existing.get(record["id"])
+        if current and current["is_active"]:
+            for column in SENSOR_STATUS_COLUMNS:
+                record[column] = current[column]
+
+    inserts, updates, missing, unchanged = diff_records(existing, known, SENSOR_COLUMNS)
+    retired = [
+        i for i in missing if existing[i]["end_date"] is None or existing[i]["is_active"]
+    ]
+
+    if inserts:
+        db.execute(insert(Sensor), inserts)
+    if updates:
+        db.execute(update(Sensor), updates)
+    if retired:
+        db.execute(
+            update(Sensor)
+            .where(Sensor.id.in_(retired))
+            .values(end_date=date.today(), is_active=False)
+        )
+    refresh_station_sensor_counts(db)
+    db.commit()
+    response_cache.bump(METADATA)
+    metadata_snapshot.reload(db)
+
+    return {
+        "inserted": len(inserts),
+        "updated": len(updates),
+        "retired": len(retired),
+        "unchanged": unchanged,
+        "skipped_unknown_station": len(sensors) - len(known),
+    }
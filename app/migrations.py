@@ -0,0 +1,102 @@
+from sqlalchemy import text
+from sqlalchemy.engine.base import Engine
+from app.config import settings
+from app.database import Base
+from app.metadata_sync import REFRESH_STATION_SENSOR_COUNTS
+from app.partitions import convert_to_partitioned, ensure_partitions, is_partitioned
+
+# Idempotent schema upgrades for databases created before a change to the models.
+# `Base.metadata.create_all` only creates missing tables, so constraints and columns
+# added to existing tables have to be applied here.
+UPGRADE_STEPS: list[tuple[str, str]] = [
+    (
+        "measurements_unique_sensor_timestamp",
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_constraint
+                WHERE conname = 'uq_measurements_sensor_timestamp'
+            ) THEN
+                DELETE FROM measurements a
+                USING measurements b
+                WHERE a.sensor_id = b.sensor_id
+                  AND a.timestamp = b.timestamp
+                  AND a.id > b.id;
+
+                ALTER TABLE measurements
+                ADD CONSTRAINT uq_measurements_sensor_timestamp
+                UNIQUE (sensor_id, timestamp);
+            END IF;
+        END $$;
+        """,
+    ),
+    (
+        "sensor_watermarks_seed",
+        """
+        INSERT INTO sensor_watermarks (sensor_id, last_timestamp)
+        SELECT sensor_id, max(timestamp) FROM measurements
+        WHERE NOT EXISTS (SELECT 1 FROM sensor_watermarks)
+        GROUP BY sensor_id
+        ON CONFLICT (sensor_id) DO NOTHING;
+        """,
+    ),
+    (
+        "latest_measurements_seed",
+        """
+        INSERT INTO latest_measurements (sensor_id, measurement_id, timestamp, value)
+        SELECT DISTINCT ON (sensor_id) sensor_id, id, timestamp, value
+        FROM measurements
+        WHERE NOT EXISTS (SELECT 1 FROM latest_measurements)
+        ORDER BY sensor_id, timestamp DESC
+        ON CONFLICT (sensor_id) DO NOTHING;
+        """,
+    ),
+    (
+        "stations_count_working_sensors",
+        """
+        ALTER TABLE stations
+        ADD COLUMN IF NOT EXISTS count_working_sensors INTEGER NOT NULL DEFAULT 0;
+        """,
+    ),
+    (
+        "stations_count_working_sensors_refresh",
+        REFRESH_STATION_SENSOR_COUNTS.text,
+    ),
+]
+
+
+def upgrade(engine: Engine) -> None:
+    """
+    Function responsible for applying schema upgrades to an existing database.
+    """
+
+    with engine.begin() as conn:
+        for _, statement in UPGRADE_STEPS:
+            conn.execute(text(statement))
+
+
+def migrate(engine: Engine) -> None:
+    """
+    Function responsible for bringing the database schema up to date.
+    Creates missing tables, applies upgrade steps and, with
+    MEASUREMENTS_PARTITIONED, converts an existing plain measurements table
+    (copying its rows) and makes sure the upcoming partitions exist. Idempotent.
+    """
+
+    Base.metadata.create_all(bind=engine)
+    upgrade(engine)
+
+    if settings.MEASUREMENTS_PARTITIONED:
+        if not is_partitioned(engine):
+            copied = convert_to_partitioned(engine)
+            print(f"[✓] Converted measurements to a partitioned table ({copied} rows copied)")
+        ensure_partitions(engine)
+
+
+if __name__ == "__main__":
+    from app.database import engine, wait_for_database
+
+    wait_for_database()
+    migrate(engine)
+    print("[✓] Database schema is up to date")
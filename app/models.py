@@ -7,11 +7,13 @@ from sqlalchemy import (
     Float,
     Boolean,
     DateTime,
+    UniqueConstraint,
+    JSON,
+    LargeBinary,
 )
 from sqlalchemy.orm import relationship
+from app.config import settings
 from app.database import Base
-from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy import select, func
 from sqlalchemy.orm import object_session
 
 
@@ -33,34 +35,14 @@ class Station(Base):
     address = Column(String, nullable=True)
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
+    # Liczba aktywnych czujników automatycznych, aktualizowana przy synchronizacji
+    # sensorów i sprawdzaniu ich aktywności (refresh_station_sensor_counts)
+    count_working_sensors = Column(Integer, nullable=False, default=0, server_default="0")
 
     sensors = relationship(
         "Sensor", back_populates="station", cascade="all, delete-orphan"
     )
 
-    @hybrid_property
-    def count_working_sensors(self) -> int:
-        return sum(
-            1
-            for sensor in self.sensors
-            if sensor.is_active and sensor.measurement_type == "automatyczny"
-        )
-
-    @count_working_sensors.expression
-    def count_working_sensors(cls):
-        from sqlalchemy.orm import aliased
-        SensorAlias = aliased(Sensor)
-        return (
-            select(func.count(SensorAlias.id))
-            .where(
-                SensorAlias.station_code == cls.code,
-                SensorAlias.is_active == True,
-                SensorAlias.measurement_type == "automatyczny"
-            )
-            .correlate(cls)
-            .scalar_subquery()
-        )
-
     def __repr__(self):
         return f"Station({self.id}, {self.name}, {self.code}, {self.voivodeship}, {self.city})"
 
@@ -102,9 +84,22 @@ class Sensor(Base):
 
 class Measurement(Base):
     __tablename__ = "measurements"
+    __table_args__ = (
+        UniqueConstraint(
+            "sensor_id", "timestamp", name="uq_measurements_sensor_timestamp"
+        ),
+        # Partycjonowana tabela musi mieć klucz partycjonowania w kluczu głównym
+        (
+            {"postgresql_partition_by": "RANGE (timestamp)"}
+            if settings.MEASUREMENTS_PARTITIONED
+            else {}
+        ),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    timestamp = Column(DateTime, nullable=False)
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    timestamp = Column(
+        DateTime, nullable=False, primary_key=settings.MEASUREMENTS_PARTITIONED
+    )
     value = Column(Float, nullable=False)
     sensor_id = Column(Integer, ForeignKey("sensors.id"), nullable=False)
 
@@ -112,3 +107,119 @@ class Measurement(Base):
 
     def __repr__(self):
         return f"Measurement({self.id}, {self.timestamp}, {self.value})"
+
+
+class LatestMeasurement(Base):
+    __tablename__ = "latest_measurements"
+
+    sensor_id = Column(Integer, ForeignKey("sensors.id"), primary_key=True)
+    measurement_id = Column(Integer, nullable=False)
+    timestamp = Column(DateTime, nullable=False)
+    value = Column(Float, nullable=False)
+
+    def to_measurement(self) -> Measurement:
+        return Measurement(
+            id=self.measurement_id,
+            timestamp=self.timestamp,
+            value=self.value,
+            sensor_id=self.sensor_id,
+        )
+
+    def __repr__(self):
+        return f"LatestMeasurement({self.sensor_id}, {self.timestamp}, {self.value})"
+
+
+class MeasurementRollup(Base):
+    __tablename__ = "measurement_rollups"
+
+    sensor_id = Column(Integer, ForeignKey("sensors.id"), primary_key=True)
+    bucket = Column(String, primary_key=True)  # hour, day, month
+    bucket_start = Column(DateTime, primary_key=True)
+    count = Column(Integer, nullable=False)
+    sum = Column(Float, nullable=False)
+    min = Column(Float, nullable=False)
+    max = Column(Float, nullable=False)
+    sketch = Column(JSON, nullable=False)
+
+    def __repr__(self):
+        return f"MeasurementRollup({self.sensor_id}, {self.bucket}, {self.bucket_start}, {self.count})"
+
+
+class SensorWatermark(Base):
+    __tablename__ = "sensor_watermarks"
+
+    sensor_id = Column(Integer, ForeignKey("sensors.id"), primary_key=True)
+    last_timestamp = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"SensorWatermark({self.sensor_id}, {self.last_timestamp})"
+
+
+class IngestionSchedule(Base):
+    __tablename__ = "ingestion_schedules"
+
+    sensor_id = Column(Integer, ForeignKey("sensors.id"), primary_key=True)
+    interval_seconds = Column(Integer, nullable=False)
+    next_due_at = Column(DateTime, nullable=False, index=True)
+    last_success_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
+    failure_count = Column(Integer, nullable=False, default=0)
+    is_paused = Column(Boolean, nullable=False, default=False)
+
+    def __repr__(self):
+        return f"IngestionSchedule({self.sensor_id}, {self.interval_seconds}, {self.next_due_at})"
+
+
+class IngestionWorker(Base):
+    __tablename__ = "ingestion_workers"
+
+    worker_id = Column(String, primary_key=True)
+    hostname = Column(String, nullable=False)
+    pid = Column(Integer, nullable=False)
+    started_at = Column(DateTime, nullable=False)
+    heartbeat_at = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"IngestionWorker({self.worker_id}, {self.heartbeat_at})"
+
+
+class IngestionLease(Base):
+    __tablename__ = "ingestion_leases"
+
+    shard = Column(Integer, primary_key=True)
+    holder = Column(String, nullable=True)
+    expires_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"IngestionLease({self.shard}, {self.holder}, {self.expires_at})"
+
+
+class BackgroundJob(Base):
+    __tablename__ = "background_jobs"
+
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False, index=True)
+    status = Column(String, nullable=False)
+    progress = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"BackgroundJob({self.id}, {self.kind}, {self.status})"
+
+
+class StoredReport(Base):
+    __tablename__ = "reports"
+
+    report_key = Column(String, primary_key=True)
+    filename = Column(String, nullable=False)
+    content = Column(LargeBinary, nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"StoredReport({self.report_key}, {self.filename}, {self.size})"
@@ -0,0 +1,75 @@
+import base64
+import json
+import math
+from datetime import datetime
+from typing import Generic, Optional, TypeVar
+from fastapi import HTTPException, status
+from fastapi_pagination import Params
+from pydantic import BaseModel, ValidationError
+
+T = TypeVar("T")
+C = TypeVar("C", bound=BaseModel)
+
+
+class CursorPage(BaseModel, Generic[T]):
+    items: list[T]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+
+class IdCursor(BaseModel):
+    """Pozycja kursora stron uporządkowanych po id."""
+    id: int
+
+
+class TimestampIdCursor(BaseModel):
+    """Pozycja kursora stron uporządkowanych po (timestamp, id)."""
+    timestamp: datetime
+    id: int
+
+
+def encode_cursor(values: dict) -> str:
+    """Zamienia pozycję ostatniego elementu strony na nieprzezroczysty token."""
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, schema: type[C]) -> C:
+    """
+    Odczytuje pozycję z tokenu kursora i sprawdza ją schematem endpointu.
+    Uszkodzony lub zmieniony token kończy się błędem 400.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return schema.model_validate(values)
+    except (ValueError, ValidationError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Nieprawidłowy kursor"
+        )
+
+
+def keyset_page(items: list, size: int, position) -> tuple[list, Optional[str]]:
+    """
+    Przycina wynik pobrany z limitem size + 1 do size elementów i zwraca token
+    kursora wskazujący ostatni element, jeśli istnieje kolejna strona.
+    """
+    if len(items) <= size:
+        return items, None
+    items = items[:size]
+    return items, encode_cursor(position(items[-1]))
+
+
+def offset_page(items: list, params: Params) -> tuple[list, dict]:
+    """
+    Dzieli listę w pamięci na strony tak jak fastapi_pagination.paginate.
+    Zwraca elementy strony i pozostałe pola odpowiedzi Page.
+    """
+    total = len(items)
+    offset = (params.page - 1) * params.size
+    return items[offset:offset + params.size], {
+        "total": total,
+        "page": params.page,
+        "size": params.size,
+        "pages": math.ceil(total / params.size),
+    }
@@ -0,0 +1,232 @@
+import re
+from datetime import date
+from sqlalchemy import text
+from sqlalchemy.engine.base import Connection, Engine
+from app.config import settings
+
+PARTITION_NAME = re.compile(r"^measurements_y(\d{4})m(\d{2})$")
+DEFAULT_PARTITION = "measurements_default"
+# Wiersze z partycji domyślnej usuwamy paczkami, żeby nie trzymać długo blokad
+RETENTION_DELETE_BATCH = 10000
+
+
+def add_months(day: date, months: int) -> date:
+    """Zwraca pierwszy dzień miesiąca przesuniętego o podaną liczbę miesięcy."""
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(month_start: date) -> str:
+    return f"measurements_y{month_start.year}m{month_start.month:02d}"
+
+
+def is_partitioned(engine: Engine) -> bool:
+    """Sprawdza, czy tabela measurements jest tabelą partycjonowaną."""
+    with engine.connect() as conn:
+        return bool(
+            conn.execute(
+                text(
+                    "SELECT 1 FROM pg_partitioned_table "
+                    "WHERE partrelid = 'measurements'::regclass"
+                )
+            ).scalar()
+        )
+
+
+def list_partitions(engine: Engine) -> list[str]:
+    """Zwraca nazwy partycji tabeli measurements."""
+    with engine.connect() as conn:
+        return list(
+            conn.execute(
+                text(
+                    "SELECT child.relname FROM pg_inherits "
+                    "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                    "WHERE pg_inherits.inhparent = 'measurements'::regclass "
+                    "ORDER BY child.relname"
+                )
+            ).scalars()
+        )
+
+
+def create_partitions(conn: Connection, first: date, last: date, existing: set[str]) -> list[str]:
+    """
+    Tworzy partycję domyślną i miesięczne partycje od miesiąca first do last
+    (włącznie), pomijając istniejące. Zwraca nazwy utworzonych partycji.
+    """
+    created = []
+    if DEFAULT_PARTITION not in existing:
+        conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF measurements DEFAULT"))
+        created.append(DEFAULT_PARTITION)
+
+    start = add_months(first, 0)
+    while start <= last:
+        name = partition_name(start)
+        if name not in existing:
+            conn.execute(
+                text(
+                    f"CREATE TABLE {name} PARTITION OF measurements "
+                    f"FOR VALUES FROM ('{start.isoformat()}') "
+                    f"TO ('{add_months(start, 1).isoformat()}')"
+                )
+            )
+            created.append(name)
+        start = add_months(start, 1)
+    return created
+
+
+def ensure_partitions(engine: Engine, months_ahead: int | None = None) -> list[str]:
+    """
+    Tworzy miesięczne partycje tabeli measurements od bieżącego miesiąca
+    do MEASUREMENTS_PARTITIONS_AHEAD miesięcy naprzód oraz partycję domyślną
+    dla pomiarów spoza tego zakresu. Indeks (sensor_id, timestamp) jest
+    tworzony w każdej partycji przez ograniczenie unikalności tabeli nadrzędnej.
+    Zwraca nazwy utworzonych partycji.
+    """
+    if not is_partitioned(engine):
+        print(
+            "Tabela measurements nie jest partycjonowana - pomijam tworzenie partycji "
+            "(konwersję wykonuje python -m app.migrations)."
+        )
+        return []
+
+    months_ahead = (
+        settings.MEASUREMENTS_PARTITIONS_AHEAD if months_ahead is None else months_ahead
+    )
+    existing = set(list_partitions(engine))
+    current = add_months(date.today(), 0)
+
+    with engine.begin() as conn:
+        return create_partitions(conn, current, add_months(current, months_ahead), existing)
+
+
+def convert_to_partitioned(engine: Engine, months_ahead: int | None = None) -> int:
+    """
+    Zamienia istniejącą zwykłą tabelę measurements na partycjonowaną po czasie
+    w jednej transakcji: tworzy nową tabelę o tych samych kolumnach, partycje
+    miesięczne od najstarszego pomiaru do MEASUREMENTS_PARTITIONS_AHEAD miesięcy
+    naprzód, kopiuje pomiary, usuwa starą tabelę i odtwarza ograniczenia.
+    Tabela jest zablokowana na czas kopiowania. Zwraca liczbę skopiowanych wierszy.
+    """
+    months_ahead = (
+        settings.MEASUREMENTS_PARTITIONS_AHEAD if months_ahead is None else months_ahead
+    )
+    current = add_months(date.today(), 0)
+
+    with engine.begin() as conn:
+        conn.execute(text("LOCK TABLE measurements IN ACCESS EXCLUSIVE MODE"))
+        oldest = conn.execute(text("SELECT min(timestamp) FROM measurements")).scalar()
+        sequence = conn.execute(text("SELECT pg_get_serial_sequence('measurements', 'id')")).scalar()
+
+        conn.execute(text("ALTER TABLE measurements RENAME TO measurements_unpartitioned"))
+        conn.execute(
+            text(
+                "CREATE TABLE measurements (LIKE measurements_unpartitioned INCLUDING DEFAULTS) "
+                "PARTITION BY RANGE (timestamp)"
+            )
+        )
+        if sequence:
+            # Sekwencja id należy do starej tabeli i zostałaby usunięta razem z nią
+            conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY measurements.id"))
+
+        first = min(add_months(oldest.date(), 0), current) if oldest else current
+        create_partitions(conn, first, add_months(current, months_ahead), set())
+
+        copied = conn.execute(
+            text("INSERT INTO measurements SELECT * FROM measurements_unpartitioned")
+        ).rowcount
+        conn.execute(text("DROP TABLE measurements_unpartitioned"))
+
+        # Te same ograniczenia i indeksy, które tworzy create_all dla tabeli partycjonowanej
+        conn.execute(text("ALTER TABLE measurements ADD PRIMARY KEY (id, timestamp)"))
+        conn.execute(
+            text(
+                "ALTER TABLE measurements ADD CONSTRAINT uq_measurements_sensor_timestamp "
+                "UNIQUE (sensor_id, timestamp)"
+            )
+        )
+        conn.execute(
+            text(
+                "ALTER TABLE measurements ADD CONSTRAINT measurements_sensor_id_fkey "
+                "FOREIGN KEY (sensor_id) REFERENCES sensors (id)"
+            )
+        )
+        conn.execute(text("CREATE INDEX ix_measurements_id ON measurements (id)"))
+
+    return copied
+
+
+def apply_retention(engine: Engine, retention_months: int | None = None) -> list[str]:
+    """
+    Usuwa całe partycje starsze niż MEASUREMENTS_RETENTION_MONTHS miesięcy
+    (DETACH + DROP zamiast DELETE na pojedynczych wierszach).
+    Zwraca nazwy usuniętych partycji.
+    """
+    retention_months = (
+        settings.MEASUREMENTS_RETENTION_MONTHS
+        if retention_months is None
+        else retention_months
+    )
+    if retention_months <= 0 or not is_partitioned(engine):
+        return []
+
+    cutoff = add_months(date.today(), -retention_months)
+    dropped = []
+
+    for name in list_partitions(engine):
+        match = PARTITION_NAME.match(name)
+        if not match:
+            continue
+
+        month_start = date(int(match.group(1)), int(match.group(2)), 1)
+        if add_months(month_start, 1) > cutoff:
+            continue
+
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE measurements DETACH PARTITION {name}"))
+            conn.execute(text(f"DROP TABLE {name}"))
+        dropped.append(name)
+
+    return dropped
+
+
+def apply_default_retention(engine: Engine, retention_months: int | None = None) -> int:
+    """
+    Usuwa z partycji domyślnej pomiary starsze niż MEASUREMENTS_RETENTION_MONTHS.
+    Trafia tam cała historia sprzed pierwszej miesięcznej partycji (np. dane
+    sprzed włączenia partycjonowania), której nie obejmuje apply_retention.
+    Zwraca liczbę usuniętych wierszy.
+    """
+    retention_months = (
+        settings.MEASUREMENTS_RETENTION_MONTHS
+        if retention_months is None
+        else retention_months
+    )
+    if (
+        retention_months <= 0
+        or not is_partitioned(engine)
+        or DEFAULT_PARTITION not in list_partitions(engine)
+    ):
+        return 0
+
+    cutoff = add_months(date.today(), -retention_months)
+    stmt = text(
+        f"DELETE FROM {DEFAULT_PARTITION} WHERE ctid IN ("
+        f"SELECT ctid FROM {DEFAULT_PARTITION} WHERE timestamp < :cutoff LIMIT :batch)"
+    )
+
+    deleted = 0
+    while True:
+        with engine.begin() as conn:
+            count = conn.execute(stmt, {"cutoff": cutoff, "batch": RETENTION_DELETE_BATCH}).rowcount
+        deleted += count
+        if count < RETENTION_DELETE_BATCH:
+            return deleted
+
+
+def run_maintenance(engine: Engine) -> dict:
+    """Tworzy brakujące partycje i stosuje politykę retencji."""
+    return {
+        "created": ensure_partitions(engine),
+        "dropped": apply_retention(engine),
+        "deleted_default_rows": apply_default_retention(engine),
+    }
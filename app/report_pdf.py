@@ -0,0 +1,151 @@
+from datetime import datetime
+from io import BytesIO
+
+# Moduł jest importowany w procesach roboczych puli raportów, dlatego nie
+# zależy od bazy danych ani od aplikacji - dostaje gotowe dane raportu.
+
+FONT_NAME = "DejaVuSans"
+FONT_PATH = "./DejaVuSans.ttf"
+
+
+def init_worker() -> None:
+    """Jednorazowa konfiguracja procesu roboczego: backend matplotlib i czcionka."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_PATH))
+
+
+def figure_to_png(fig) -> BytesIO:
+    img_buffer = BytesIO()
+    fig.savefig(img_buffer, format="png")
+    img_buffer.seek(0)
+    return img_buffer
+
+
+def generate_plot(timestamps: list[datetime], values: list[float], sensor_name: str) -> BytesIO:
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    ax = fig.subplots()
+    ax.plot(timestamps, values, marker='o')
+    ax.set_title(f'Pomiar: {sensor_name}')
+    ax.set_xlabel("Czas")
+    ax.set_ylabel("Wartość")
+    ax.grid(True)
+    fig.autofmt_xdate()
+    return figure_to_png(fig)
+
+
+def generate_histogram(histogram: dict, label: str) -> BytesIO:
+    from matplotlib.figure import Figure
+
+    edges, counts = histogram["edges"], histogram["counts"]
+    widths = [high - low for low, high in zip(edges, edges[1:])]
+
+    fig = Figure()
+    ax = fig.subplots()
+    ax.bar(edges[:-1], counts, width=widths, align="edge", color="green", edgecolor="black")
+    ax.set_title(f"{label} - Histogram wartości")
+    ax.set_xlabel("Wartość")
+    ax.set_ylabel("Liczba wystąpień")
+    fig.tight_layout()
+    return figure_to_png(fig)
+
+
+def add_metadata(canvas, doc):
+    canvas.setTitle("Raport stacji pomiarowej")
+    canvas.setAuthor("System Monitoringu Powietrza")
+    canvas.setSubject("Automatyczny raport PDF")
+    canvas.setFont("Helvetica", 8)
+    canvas.drawString(30, 20, f"Data wygenerowania: {datetime.now().strftime('%Y-%m-%d %H:00')}")
+
+
+def render_report(data: dict) -> bytes:
+    """
+    Składa raport PDF stacji z danych przygotowanych przez app.reports.load_report_data.
+    Uruchamiany w procesie roboczym puli raportów.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, PageBreak
+
+    station = data["station"]
+    start_time, end_time = data["start_time"], data["end_time"]
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    styles = getSampleStyleSheet()
+    for style in styles.byName.values():
+        style.fontName = FONT_NAME
+
+    title_style = ParagraphStyle("Tytul", parent=styles["Title"], fontSize=24, alignment=1, spaceAfter=20)
+    section_style = ParagraphStyle("Sekcja", parent=styles["Heading1"], fontSize=18, textColor=colors.black, spaceBefore=10, spaceAfter=10)
+    normal_style = ParagraphStyle("Normalny", parent=styles["Normal"], fontSize=11, spaceAfter=6)
+    italic_style = ParagraphStyle("Italic", parent=styles["Italic"], fontSize=11, textColor=colors.grey, spaceAfter=6)
+
+    elements = []
+
+    # ✅ STRONA TYTUŁOWA – ROZBUDOWANA I CZYTELNA
+    elements.append(Spacer(1, 50))
+    elements.append(Paragraph("Raport ze stacji pomiarowej", title_style))
+    elements.append(Spacer(1, 30))
+
+    elements.append(Paragraph(
+        f"Raport obejmuje dane pomiarowe zarejestrowane przez stację <b>{station['name']}</b> "
+        f"(kod: {station['code']}), zlokalizowaną w miejscowości {station['city']}, województwie {station['voivodeship']}, "
+        f"pod adresem: {station['address']}. W momencie generowania raportu stacja posiada "
+        f"{station['count_working_sensors']} aktywnych czujników automatycznych, spośród wszystkich {station['sensor_count']} zainstalowanych czujników. "
+        f"Łącznie zgromadzono {station['measurement_count']} pomiarów. "
+        f"Zakres czasowy raportu obejmuje okres od {start_time.strftime('%Y-%m-%d %H:%M')} do {end_time.strftime('%Y-%m-%d %H:%M')}. "
+        f"Dokument zawiera szczegółowe informacje o czujnikach, statystyki wyników (min, max, średnia, mediana) oraz wykresy pomiarów. "
+        f"Dane wykorzystywane w raporcie pochodzą z publicznego interfejsu API Głównego Inspektoratu Ochrony Środowiska, "
+        f"dostępnego pod adresem: <a href='https://api.gios.gov.pl/pjp-api/swagger-ui/#/'>https://api.gios.gov.pl/pjp-api/swagger-ui/#/</a>. "
+        f"Źródło to stanowi oficjalne i wiarygodne repozytorium danych o jakości powietrza w Polsce.",
+        normal_style
+    ))
+
+    # ✅ STRONY Z CZUJNIKAMI
+    for sensor in data["sensors"]:
+        timestamps, values = sensor["timestamps"], sensor["values"]
+        statistics = sensor["statistics"]
+
+        elements.append(Paragraph(f"Czujnik: {sensor['indicator_name']}", section_style))
+        elements.append(Paragraph(f"Uśrednianie: {sensor['averaging_time']}", normal_style))
+        elements.append(Paragraph(f"Aktywny: {'Tak' if sensor['is_active'] else 'Nie'}", normal_style))
+        elements.append(Paragraph(f"Liczba pomiarów: {statistics['count'] if statistics else 0}", normal_style))
+
+        if statistics:
+            stats = {
+                "Min": round(statistics["min"], 2),
+                "Max": round(statistics["max"], 2),
+                "Średnia": round(statistics["mean"], 2),
+                "Mediana": round(statistics["median"], 2)
+            }
+
+            # Średni odstęp czasu
+            if statistics["avg_interval_hours"] is not None:
+                avg_interval = round(statistics["avg_interval_hours"], 2)
+                elements.append(Paragraph(f"Średni odstęp pomiarów: {avg_interval} godz.", normal_style))
+
+            stats_text = ", ".join([f"{k}: {v}" for k, v in stats.items()])
+            elements.append(Paragraph(f"Statystyki: {stats_text}", normal_style))
+
+            chart = generate_plot(timestamps, values, sensor["indicator_name"])
+            hist = generate_histogram(sensor["histogram"], sensor["indicator_name"])
+
+            elements.append(Image(chart, width=400, height=200))
+            elements.append(Spacer(1, 10))
+            elements.append(Image(hist, width=400, height=200))
+        else:
+            elements.append(Paragraph("Brak danych pomiarowych w podanym okresie.", italic_style))
+
+        elements.append(PageBreak())
+
+    doc.build(elements, onFirstPage=add_metadata)
+    return buffer.getvalue()
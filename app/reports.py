@@ -0,0 +1,261 @@
+import asyncio
+import hashlib
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from app.config import settings
+from app.database import SessionLocal
+from app.jobs import Job, finished_job, start_job
+from app.models import Measurement, Sensor, Station, StoredReport
+from app.report_pdf import init_worker, render_report
+from app.stats import sensor_statistics, station_measurement_count, value_histograms
+
+REPORT_JOB = "pdf_report"
+
+
+class ReportCache:
+    """
+    Ostatnio pobierane raporty PDF w pamięci procesu (LRU), przed tabelą reports.
+    Klucz zawiera odcisk danych pomiarowych, więc nowe lub poprawione pomiary
+    dają nowy klucz.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            pdf = self._entries.get(key)
+            if pdf is not None:
+                self._entries.move_to_end(key)
+            return pdf
+
+    def put(self, key: str, pdf: bytes) -> None:
+        with self._lock:
+            self._entries[key] = pdf
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+report_cache = ReportCache(settings.REPORT_CACHE_MAX_ENTRIES)
+
+# Zadania w toku według klucza raportu - identyczne zlecenia dostają to samo zadanie
+_pending: dict[str, Job] = {}
+_pool: ProcessPoolExecutor | None = None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """
+    Pula procesów renderujących, tworzona przy pierwszym raporcie. Procesy
+    startują metodą spawn (bez kopiowania wątków i połączeń serwera), a czcionki
+    i backend matplotlib konfigurują raz w init_worker.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.REPORT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+        )
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def report_key(station_id: int, sensor_ids: list[int], start: datetime, end: datetime) -> tuple[str, str]:
+    """
+    Zwraca klucz raportu i kod stacji. Klucz obejmuje stację, sensory, zakres
+    czasu oraz odcisk danych (liczba, najnowszy znacznik czasu i suma wartości
+    pomiarów każdego sensora) liczony jednym zapytaniem agregującym.
+    """
+    db = SessionLocal()
+    try:
+        station_code = db.execute(
+            select(Station.code).where(Station.id == station_id)
+        ).scalar_one_or_none()
+        if station_code is None:
+            raise LookupError(f"Nie znaleziono stacji o id: {station_id}")
+
+        fingerprint = db.execute(
+            select(
+                Measurement.sensor_id,
+                func.count(),
+                func.max(Measurement.timestamp),
+                func.sum(Measurement.value),
+            )
+            .where(
+                Measurement.sensor_id.in_(sensor_ids),
+                Measurement.timestamp >= start,
+                Measurement.timestamp <= end,
+            )
+            .group_by(Measurement.sensor_id)
+            .order_by(Measurement.sensor_id)
+        ).all()
+    finally:
+        db.close()
+
+    content = repr(
+        (station_id, sorted(set(sensor_ids)), start.isoformat(), end.isoformat(), [tuple(row) for row in fingerprint])
+    )
+    return hashlib.sha256(content.encode()).hexdigest(), station_code
+
+
+def store_report(key: str, filename: str, pdf: bytes) -> None:
+    """
+    Zapisuje raport w tabeli reports, wspólnej dla wszystkich workerów i replik,
+    i usuwa raporty starsze niż REPORT_RETENTION_DAYS.
+    """
+    now = datetime.now()
+    db = SessionLocal()
+    try:
+        db.execute(
+            insert(StoredReport)
+            .values(report_key=key, filename=filename, content=pdf, size=len(pdf), created_at=now)
+            .on_conflict_do_nothing(index_elements=[StoredReport.report_key])
+        )
+        db.execute(
+            delete(StoredReport).where(
+                StoredReport.created_at < now - timedelta(days=settings.REPORT_RETENTION_DAYS)
+            )
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def stored_report_size(key: str) -> int | None:
+    """Rozmiar zapisanego raportu (bez pobierania treści) albo None, jeśli go nie ma."""
+    db = SessionLocal()
+    try:
+        return db.execute(
+            select(StoredReport.size).where(StoredReport.report_key == key)
+        ).scalar_one_or_none()
+    finally:
+        db.close()
+
+
+def load_report(key: str) -> bytes | None:
+    """Treść raportu z pamięci procesu albo z tabeli reports."""
+    pdf = report_cache.get(key)
+    if pdf is not None:
+        return pdf
+
+    db = SessionLocal()
+    try:
+        pdf = db.execute(
+            select(StoredReport.content).where(StoredReport.report_key == key)
+        ).scalar_one_or_none()
+    finally:
+        db.close()
+    if pdf is not None:
+        report_cache.put(key, pdf)
+    return pdf
+
+
+def load_report_data(station_id: int, sensor_ids: list[int], start: datetime, end: datetime) -> dict:
+    """Przygotowuje dane raportu jako zwykłe struktury, które można przekazać do procesu roboczego."""
+    # numpy ładowany dopiero przy pierwszym raporcie
+    from app.timeseries import downsample, load_series
+
+    db = SessionLocal()
+    try:
+        station = db.get(Station, station_id)
+        sensors = (
+            db.query(Sensor).filter(Sensor.id.in_(sensor_ids)).order_by(Sensor.id).all()
+        )
+
+        sensor_ids = [sensor.id for sensor in sensors]
+        series = {}
+        for sensor_id, (timestamps, values) in load_series(db, sensor_ids, start, end).items():
+            timestamps, values = downsample(timestamps, values, settings.REPORT_CHART_POINTS)
+            series[sensor_id] = {"timestamps": timestamps.tolist(), "values": values.tolist()}
+
+        statistics = sensor_statistics(db, sensor_ids, start, end)
+        histograms = value_histograms(db, sensor_ids, start, end)
+
+        return {
+            "station": {
+                "name": station.name,
+                "code": station.code,
+                "city": station.city,
+                "voivodeship": station.voivodeship,
+                "address": station.address,
+                "count_working_sensors": station.count_working_sensors,
+                "sensor_count": db.query(Sensor).filter(Sensor.station_code == station.code).count(),
+                "measurement_count": station_measurement_count(db, station.code),
+            },
+            "start_time": start,
+            "end_time": end,
+            "sensors": [
+                {
+                    "indicator_name": sensor.indicator_name,
+                    "averaging_time": sensor.averaging_time,
+                    "is_active": sensor.is_active,
+                    "statistics": statistics.get(sensor.id),
+                    "histogram": histograms.get(sensor.id),
+                    **series[sensor.id],
+                }
+                for sensor in sensors
+            ],
+        }
+    finally:
+        db.close()
+
+
+async def submit_report(station_id: int, sensor_ids: list[int], start: datetime, end: datetime) -> Job:
+    """
+    Zleca wygenerowanie raportu PDF stacji i zwraca zadanie. Raport już zapisany
+    (w pamięci procesu lub w tabeli reports) zwracany jest od razu jako
+    zakończone zadanie, a identyczne zlecenie w toku nie uruchamia drugiego
+    renderowania.
+    """
+    key, station_code = await asyncio.to_thread(report_key, station_id, sensor_ids, start, end)
+    result = {"report_id": key, "filename": f"raport_stacji_{station_code}.pdf"}
+
+    pdf = report_cache.get(key)
+    size = len(pdf) if pdf is not None else await asyncio.to_thread(stored_report_size, key)
+    if size is not None:
+        return await finished_job(REPORT_JOB, {**result, "size": size, "cached": True})
+
+    if key in _pending:
+        return _pending[key]
+
+    async def generate(job: Job) -> dict:
+        try:
+            data = await asyncio.to_thread(load_report_data, station_id, sensor_ids, start, end)
+            loop = asyncio.get_running_loop()
+            pdf = await loop.run_in_executor(get_pool(), render_report, data)
+            await asyncio.to_thread(store_report, key, result["filename"], pdf)
+            report_cache.put(key, pdf)
+            return {**result, "size": len(pdf), "cached": False}
+        finally:
+            _pending.pop(key, None)
+
+    job = await start_job(REPORT_JOB, generate)
+    _pending[key] = job
+    return job
+
+
+def get_report(job: Job) -> tuple[bytes, str] | None:
+    """
+    Zwraca treść i nazwę pliku raportu zakończonego zadania. Działa w każdym
+    procesie - zadanie i raport są zapisane w bazie. None, jeśli raport usunięto.
+    """
+    if job.kind != REPORT_JOB or job.status != "done":
+        return None
+    pdf = load_report(job.result["report_id"])
+    if pdf is None:
+        return None
+    return pdf, job.result["filename"]
@@ -0,0 +1,258 @@
+import argparse
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_, select, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.models import Measurement, MeasurementRollup, Sensor
+
+BUCKETS = ("hour", "day", "month")
+
+# Szkic rozkładu wartości o stałej względnej dokładności (jak DDSketch):
+# wartość v trafia do kubełka ceil(log_gamma(v)), a kubełki można sumować,
+# więc szkice dni i miesięcy powstają z szkiców godzin bez sięgania do pomiarów.
+SKETCH_RELATIVE_ACCURACY = 0.01
+SKETCH_GAMMA = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+SKETCH_LOG_GAMMA = math.log(SKETCH_GAMMA)
+SKETCH_MIN_VALUE = 1e-9
+SKETCH_ZERO_KEY = "z"
+
+
+def sketch_key(value: float) -> str:
+    if value <= SKETCH_MIN_VALUE:
+        return SKETCH_ZERO_KEY
+    return str(math.ceil(math.log(value) / SKETCH_LOG_GAMMA))
+
+
+def sketch_value(key: str) -> float:
+    if key == SKETCH_ZERO_KEY:
+        return 0.0
+    return 2 * SKETCH_GAMMA ** int(key) / (SKETCH_GAMMA + 1)
+
+
+def sketch_quantile(sketch: dict[str, int], q: float, low: float, high: float) -> float | None:
+    """Zwraca przybliżony kwantyl q (względny błąd ok. 1%) ze szkicu rozkładu."""
+    total = sum(sketch.values())
+    if total == 0:
+        return None
+
+    rank = q * (total - 1)
+    seen = 0
+    keys = sorted(sketch, key=lambda k: -math.inf if k == SKETCH_ZERO_KEY else int(k))
+    for key in keys:
+        seen += sketch[key]
+        if seen > rank:
+            return min(max(sketch_value(key), low), high)
+    return high
+
+
+def truncate(timestamp: datetime, bucket: str) -> datetime:
+    """Zwraca początek przedziału (godziny, dnia lub miesiąca) dla znacznika czasu."""
+    if bucket == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    if bucket == "day":
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    return timestamp.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def bucket_end(start: datetime, bucket: str) -> datetime:
+    if bucket == "hour":
+        return start + timedelta(hours=1)
+    if bucket == "day":
+        return start + timedelta(days=1)
+    return (start + timedelta(days=32)).replace(day=1)
+
+
+def empty_rollup() -> dict:
+    return {"count": 0, "sum": 0.0, "min": math.inf, "max": -math.inf, "sketch": {}}
+
+
+def add_value(rollup: dict, value: float) -> None:
+    rollup["count"] += 1
+    rollup["sum"] += value
+    rollup["min"] = min(rollup["min"], value)
+    rollup["max"] = max(rollup["max"], value)
+    key = sketch_key(value)
+    rollup["sketch"][key] = rollup["sketch"].get(key, 0) + 1
+
+
+def merge_rollup(rollup: dict, other) -> None:
+    rollup["count"] += other.count
+    rollup["sum"] += other.sum
+    rollup["min"] = min(rollup["min"], other.min)
+    rollup["max"] = max(rollup["max"], other.max)
+    for key, count in other.sketch.items():
+        rollup["sketch"][key] = rollup["sketch"].get(key, 0) + count
+
+
+def in_ranges(sensor_column, time_column, keys: dict[int, set[datetime]], bucket: str):
+    """Warunek: dla każdego sensora zakres od najstarszego do najnowszego przedziału."""
+    return or_(
+        *(
+            and_(
+                sensor_column == sensor_id,
+                time_column >= min(starts),
+                time_column < bucket_end(max(starts), bucket),
+            )
+            for sensor_id, starts in keys.items()
+        )
+    )
+
+
+def save_rollups(db: Session, bucket: str, rollups: dict[tuple[int, datetime], dict]) -> None:
+    rows = [
+        {"sensor_id": sensor_id, "bucket": bucket, "bucket_start": start, **rollup}
+        for (sensor_id, start), rollup in rollups.items()
+        if rollup["count"]
+    ]
+    if not rows:
+        return
+
+    stmt = insert(MeasurementRollup).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[
+            MeasurementRollup.sensor_id,
+            MeasurementRollup.bucket,
+            MeasurementRollup.bucket_start,
+        ],
+        set_={
+            "count": stmt.excluded.count,
+            "sum": stmt.excluded.sum,
+            "min": stmt.excluded.min,
+            "max": stmt.excluded.max,
+            "sketch": stmt.excluded.sketch,
+        },
+    )
+    db.execute(stmt)
+
+
+def rebuild_hours(db: Session, hours: dict[int, set[datetime]]) -> None:
+    """Przelicza agregaty godzinowe z surowych pomiarów."""
+    rollups = defaultdict(empty_rollup)
+    rows = db.execute(
+        select(Measurement.sensor_id, Measurement.timestamp, Measurement.value).where(
+            in_ranges(Measurement.sensor_id, Measurement.timestamp, hours, "hour")
+        )
+    )
+    for row in rows:
+        start = truncate(row.timestamp, "hour")
+        if start in hours[row.sensor_id]:
+            add_value(rollups[(row.sensor_id, start)], row.value)
+
+    save_rollups(db, "hour", rollups)
+
+
+def rebuild_from(db: Session, source: str, target: str, starts: dict[int, set[datetime]]) -> None:
+    """Przelicza agregaty dzienne z godzinowych albo miesięczne z dziennych."""
+    rollups = defaultdict(empty_rollup)
+    parts = db.execute(
+        select(
+            MeasurementRollup.sensor_id,
+            MeasurementRollup.bucket_start,
+            MeasurementRollup.count,
+            MeasurementRollup.sum,
+            MeasurementRollup.min,
+            MeasurementRollup.max,
+            MeasurementRollup.sketch,
+        ).where(
+            MeasurementRollup.bucket == source,
+            in_ranges(
+                MeasurementRollup.sensor_id,
+                MeasurementRollup.bucket_start,
+                starts,
+                target,
+            ),
+        )
+    )
+    for part in parts:
+        start = truncate(part.bucket_start, target)
+        if start in starts[part.sensor_id]:
+            merge_rollup(rollups[(part.sensor_id, start)], part)
+
+    save_rollups(db, target, rollups)
+
+
+def refresh_rollups(db: Session, changed: list[tuple[int, datetime]]) -> None:
+    """
+    Aktualizuje agregaty dla zmienionych pomiarów (sensor_id, timestamp).
+    Godziny są liczone z pomiarów, dni z godzin, a miesiące z dni, więc koszt
+    zależy od liczby zmienionych przedziałów, a nie od liczby wszystkich pomiarów.
+    Nie wykonuje commit - transakcją zarządza wywołujący.
+    """
+    if not changed:
+        return
+
+    starts = {bucket: defaultdict(set) for bucket in BUCKETS}
+    for sensor_id, timestamp in changed:
+        for bucket in BUCKETS:
+            starts[bucket][sensor_id].add(truncate(timestamp, bucket))
+
+    rebuild_hours(db, starts["hour"])
+    rebuild_from(db, "hour", "day", starts["day"])
+    rebuild_from(db, "day", "month", starts["month"])
+
+
+def summarize_rollup(rollup: MeasurementRollup) -> dict:
+    """Zwraca statystyki przedziału: liczność, min, max, średnią i kwantyle."""
+    return {
+        "bucket_start": rollup.bucket_start,
+        "count": rollup.count,
+        "min": rollup.min,
+        "max": rollup.max,
+        "mean": rollup.sum / rollup.count,
+        "median": sketch_quantile(rollup.sketch, 0.5, rollup.min, rollup.max),
+        "p95": sketch_quantile(rollup.sketch, 0.95, rollup.min, rollup.max),
+    }
+
+
+def backfill_rollups(db: Session, sensor_ids: list[int] | None = None) -> int:
+    """Wypełnia agregaty dla istniejących pomiarów, miesiąc po miesiącu."""
+    if not sensor_ids:
+        sensor_ids = list(db.execute(select(Sensor.id).order_by(Sensor.id)).scalars())
+
+    processed = 0
+    for sensor_id in sensor_ids:
+        first, last = db.execute(
+            select(func.min(Measurement.timestamp), func.max(Measurement.timestamp)).where(
+                Measurement.sensor_id == sensor_id
+            )
+        ).one()
+        if first is None:
+            continue
+
+        month = truncate(first, "month")
+        while month <= last:
+            timestamps = db.execute(
+                select(Measurement.timestamp).where(
+                    Measurement.sensor_id == sensor_id,
+                    Measurement.timestamp >= month,
+                    Measurement.timestamp < bucket_end(month, "month"),
+                )
+            ).scalars()
+            changed = [(sensor_id, timestamp) for timestamp in timestamps]
+            refresh_rollups(db, changed)
+            db.commit()
+
+            processed += len(changed)
+            month = bucket_end(month, "month")
+
+        print(f"[✓] Agregaty sensora {sensor_id} gotowe")
+
+    return processed
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Agregaty pomiarów")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--sensor-id", type=int, action="append", dest="sensor_ids")
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        count = backfill_rollups(session, args.sensor_ids)
+        print(f"[✓] Przeliczono agregaty dla {count} pomiarów")
+    finally:
+        session.close()
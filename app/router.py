@@ -1,90 +1,93 @@
-from sqlalchemy import func, and_, desc
-import matplotlib.pyplot as plt
-import numpy as np
-from statistics import mean, median
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen.canvas import Canvas
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfbase import pdfmetrics
-from reportlab.platypus import PageBreak
-
-
-from io import BytesIO, StringIO
-import csv
-from fastapi.responses import StreamingResponse
+import asyncio
+from sqlalchemy import func, and_, desc, select
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import Annotated, Literal
 from fastapi import APIRouter, Query, Response
 from pydantic import BaseModel
 from app.config import settings
 from app.gios_api import GiosAPI
+from app.cache import response_cache
+from app.rollups import summarize_rollup, truncate
+from app.pagination import (
+    CursorPage,
+    IdCursor,
+    TimestampIdCursor,
+    decode_cursor,
+    keyset_page,
+    offset_page,
+)
+from app.exports import iter_csv, iter_columnar
+from app.coordination import SENSOR_CHECK_LOCK, coordination_status, run_exclusive
+from app.jobs import start_job, get_job, find_running_job
+from app.reports import submit_report, get_report
+from app.stats import sensor_statistics
+from app.snapshot import metadata_snapshot
+from app.spatial import station_index
+from app.scheduler import subscribe_sensors, set_schedule_paused, cancel_schedule
 from fastapi import APIRouter, HTTPException, status, Depends, Request
-from sqlalchemy import MetaData, text
+from sqlalchemy import MetaData, text, tuple_, literal
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
-from app.database import engine, Base, get_db
+from app.database import engine, Base, get_db, get_async_db
 from app import models, schemes
 from fastapi_pagination.ext.sqlalchemy import paginate, create_page
 from fastapi_pagination import Page, Params
 from datetime import datetime, date
-import time
-from fastapi import BackgroundTasks
 
 
 router = APIRouter(prefix=settings.API_V1_STR)
 
-from reportlab.platypus import Table, TableStyle
-from reportlab.lib import colors
-
-    
-def generate_histogram(measurements, label):
-    values = [m.value for m in measurements]
-
-    fig, ax = plt.subplots()
-    ax.hist(values, bins=10, color="green", edgecolor="black")
-    ax.set_title(f"{label} - Histogram wartości")
-    ax.set_xlabel("Wartość")
-    ax.set_ylabel("Liczba wystąpień")
-    plt.tight_layout()
-
-    img_bytes = BytesIO()
-    plt.savefig(img_bytes, format="png")
-    plt.close(fig)
-    img_bytes.seek(0)
-    return img_bytes
-
-def add_metadata(canvas: Canvas, doc):
-    canvas.setTitle("Raport stacji pomiarowej")
-    canvas.setAuthor("System Monitoringu Powietrza")
-    canvas.setSubject("Automatyczny raport PDF")
-    canvas.setFont("Helvetica", 8)
-    canvas.drawString(30, 20, f"Data wygenerowania: {datetime.now().strftime('%Y-%m-%d %H:00')}")
-
-def generate_plot(measurements, sensor_name: str) -> BytesIO:
-    times = [m.timestamp for m in measurements]
-    values = [m.value for m in measurements]
-
-    fig, ax = plt.subplots()
-    ax.plot(times, values, marker='o')
-    ax.set_title(f'Pomiar: {sensor_name}')
-    ax.set_xlabel("Czas")
-    ax.set_ylabel("Wartość")
-    ax.grid(True)
-    fig.autofmt_xdate()
-
-    img_buffer = BytesIO()
-    plt.savefig(img_buffer, format='PNG')
-    plt.close(fig)
-    img_buffer.seek(0)
-    return img_buffer
+# Najnowszy pomiar wielu sensorów jednym zapytaniem - po jednym odczycie
+# indeksu (sensor_id, timestamp) na sensor
+LATEST_MEASUREMENTS_LOOKUP = text(
+    """
+    SELECT m.id, m.sensor_id, m.timestamp, m.value
+    FROM unnest(CAST(:sensor_ids AS integer[])) AS s(sensor_id)
+    CROSS JOIN LATERAL (
+        SELECT id, sensor_id, timestamp, value
+        FROM measurements
+        WHERE measurements.sensor_id = s.sensor_id
+        ORDER BY timestamp DESC
+        LIMIT 1
+    ) AS m
+    """
+)
+
+
+async def get_latest_measurements(db: AsyncSession, sensor_ids: list[int]) -> dict[int, models.Measurement]:
+    """
+    Zwraca najnowszy pomiar dla każdego z podanych sensorów.
+    Odczyt z tabeli latest_measurements, a dla sensorów, których w niej jeszcze
+    nie ma (np. nigdy nie przysłały pomiaru), jednym zapytaniem LATERAL
+    po indeksie (sensor_id, timestamp) tabeli measurements.
+    """
+    result = await db.execute(
+        select(models.LatestMeasurement).where(
+            models.LatestMeasurement.sensor_id.in_(sensor_ids)
+        )
+    )
+    measurement_map = {
+        latest.sensor_id: latest.to_measurement() for latest in result.scalars()
+    }
+
+    missing = [sensor_id for sensor_id in sensor_ids if sensor_id not in measurement_map]
+    if missing:
+        result = await db.execute(LATEST_MEASUREMENTS_LOOKUP, {"sensor_ids": missing})
+        for row in result:
+            measurement_map[row.sensor_id] = models.Measurement(
+                id=row.id, sensor_id=row.sensor_id, timestamp=row.timestamp, value=row.value
+            )
+
+    return measurement_map
+
 
 @router.post("/load_stations/", tags=['Fetch data from GIOS'])
 def load_stations(db: Session = Depends(get_db)):
     """Endpoint do pobierania i zapisywania stacji w bazie danych."""
     try:
-        GiosAPI.load_stations_to_db(db)
-        return {"message": "Stacje zostały załadowane do bazy danych."}
+        summary = GiosAPI.load_stations_to_db(db)
+        return {"message": "Stacje zostały załadowane do bazy danych.", "summary": summary}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -93,8 +96,8 @@ def load_stations(db: Session = Depends(get_db)):
 def load_sensors(db: Session = Depends(get_db)):
     """Endpoint do pobierania i zapisywania danych o czujnikach w bazie danych."""
     try:
-        GiosAPI.load_sensors_to_db(db)
-        return {"message": "Czujniki zostały załadowane do bazy danych."}
+        summary = GiosAPI.load_sensors_to_db(db)
+        return {"message": "Czujniki zostały załadowane do bazy danych.", "summary": summary}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -114,6 +117,7 @@ def clear_data(request: Request, db: Session = Depends(get_db)):
                 conn.execute(table.delete())
             conn.commit()
 
+        response_cache.bump()
         return {"message": "All data cleared successfully"}
 
     except SQLAlchemyError as e:
@@ -133,6 +137,7 @@ def drop_all_tables(request: Request, db: Session = Depends(get_db)):
                     drop_table_sql = f"DROP TABLE IF EXISTS {table.name} CASCADE"
                     conn.execute(text(drop_table_sql))
 
+        response_cache.bump()
         return {"message": "All tables dropped successfully"}
 
     except SQLAlchemyError as e:
@@ -143,7 +148,7 @@ def drop_all_tables(request: Request, db: Session = Depends(get_db)):
 
 
 @router.get("/sensors")
-def get_all_sensors_by_station_id(
+async def get_all_sensors_by_station_id(
     station_code: Annotated[str, Query(description="Station Code")],
     include_inactive: Annotated[
         bool, Query(description="Include inactive sensors")
@@ -152,40 +157,61 @@ def get_all_sensors_by_station_id(
         Literal["automatyczny", "manualny"],
         Query(description="The type of measurement the sensor performs."),
     ] = None,
+    paging: Annotated[
+        Literal["offset", "cursor"],
+        Query(description="Offset pages or cursor (keyset) pages"),
+    ] = "offset",
+    cursor: Annotated[
+        str | None, Query(description="Cursor returned as next_cursor by the previous page")
+    ] = None,
+    include_total: Annotated[
+        bool, Query(description="Count all matching rows (cursor paging only)")
+    ] = False,
     params: Params = Depends(),
-    db: Session = Depends(get_db),
-) -> Page[schemes.SensorSchema]:
-    query = db.query(models.Sensor).filter(models.Sensor.station_code == station_code)
+    db: AsyncSession = Depends(get_async_db),
+) -> Page[schemes.SensorSchema] | CursorPage[schemes.SensorSchema]:
+    snapshot = await metadata_snapshot.get_async()
+    sensors = snapshot.sensors_by_station.get(station_code, ())
 
     if not include_inactive:
-        query = query.filter(models.Sensor.is_active == True)
+        sensors = [sensor for sensor in sensors if sensor.is_active]
 
     if measurement_type:
-        query = query.filter(models.Sensor.measurement_type == measurement_type)
-
-    # Paginate query
-    page = paginate(query, params)
-    sensors = page.items
+        sensors = [sensor for sensor in sensors if sensor.measurement_type == measurement_type]
+
+    if paging == "offset" and cursor is None:
+        sensors, page = offset_page(sensors, params)
+    else:
+        total = len(sensors) if include_total else None
+        if cursor:
+            after = decode_cursor(cursor, IdCursor).id
+            sensors = [sensor for sensor in sensors if sensor.id > after]
+
+        sensors, next_cursor = keyset_page(
+            sensors[:params.size + 1], params.size, lambda sensor: {"id": sensor.id}
+        )
+        page = {"next_cursor": next_cursor, "total": total}
 
     # Get latest measurements for paginated sensors only
-    sensor_ids = [s.id for s in sensors]
-    latest_measurements = (
-        db.query(models.Measurement)
-        .filter(models.Measurement.sensor_id.in_(sensor_ids))
-        .order_by(models.Measurement.sensor_id, desc(models.Measurement.timestamp))
-        .distinct(models.Measurement.sensor_id)
-        .all()
-    )
-    measurement_map = {m.sensor_id: m for m in latest_measurements}
+    measurement_map = await get_latest_measurements(db, [s.id for s in sensors])
 
-    for sensor in sensors:
-        if sensor.id in measurement_map:
-            sensor.latest_measurement = measurement_map[sensor.id]
-
-    return page
+    items = [
+        {
+            **snapshot.sensor_json[sensor.id],
+            "latest_measurement": (
+                schemes.MeasurementSchema.model_validate(
+                    measurement_map[sensor.id], from_attributes=True
+                ).model_dump(mode="json")
+                if sensor.id in measurement_map
+                else None
+            ),
+        }
+        for sensor in sensors
+    ]
+    return JSONResponse({"items": items, **page})
 
 @router.get("/stations")
-def get_all_stations(
+async def get_all_stations(
     voivodeship: Annotated[
         Literal[
             "PODKARPACKIE",
@@ -213,84 +239,122 @@ def get_all_stations(
     only_with_active_sensors: Annotated[
         bool, Query(description="Include stations with active sensors")
     ] = False,
-    db: Session = Depends(get_db),
+    params: Params = Depends(),
 ) -> Page[schemes.StationSchema]:
-    query = db.query(models.Station)
-
-    if voivodeship:
-        query = query.filter(models.Station.voivodeship == voivodeship)
+    snapshot = await metadata_snapshot.get_async()
+    stations = (
+        snapshot.stations_by_voivodeship.get(voivodeship, ())
+        if voivodeship
+        else snapshot.stations
+    )
 
     if not include_inactive:
-        query = query.filter(models.Station.end_date.is_(None))
+        stations = [station for station in stations if station.end_date is None]
 
     if only_with_active_sensors:
-         query = (
-             query.join(models.Station.sensors)
-             .filter(
-                 and_(
-                     models.Sensor.is_active == True,
-                     models.Sensor.measurement_type == "automatyczny"
-                 )
-             )
-             .group_by(models.Station.id)
-             .having(func.count(models.Sensor.id) > 0)
-         )
-
-    return paginate(query)
+        stations = [station for station in stations if station.count_working_sensors > 0]
+
+    stations, page = offset_page(list(stations), params)
+    return JSONResponse(
+        {"items": [snapshot.station_json[station.code] for station in stations], **page}
+    )
+
+@router.get("/stations/by-active-sensors")
+async def get_stations_by_active_sensors():
+    """Endpoint do pobrania stacji uszeregowanych według liczby aktywnych czujników."""
+    snapshot = await metadata_snapshot.get_async()
+    stations = sorted(
+        (station for station in snapshot.stations if station.count_working_sensors > 0),
+        key=lambda station: (-station.count_working_sensors, station.id),
+    )
+    return [
+        {
+            "station_id": station.id,
+            "station_code": station.code,
+            "station_name": station.name,
+            "active_sensors_count": station.count_working_sensors,
+        }
+        for station in stations
+    ]
+
+
+@router.get("/stations/nearby")
+async def get_nearby_stations(
+    lat: Annotated[float, Query(ge=-90, le=90, description="Latitude")],
+    lon: Annotated[float, Query(ge=-180, le=180, description="Longitude")],
+    k: Annotated[int, Query(ge=1, le=100, description="Number of stations")] = 5,
+    indicator: Annotated[
+        str | None, Query(description="Indicator code of an active sensor, e.g. PM2.5")
+    ] = None,
+) -> list[schemes.NearbyStationSchema]:
+    """Endpoint do pobrania k najbliższych czynnych stacji wraz z odległością w km."""
+    index = station_index.get(await metadata_snapshot.get_async())
+    return JSONResponse(index.nearest(lat, lon, k, indicator))
+
+
+@router.get("/stations/bbox")
+async def get_stations_in_bbox(
+    min_lat: Annotated[float, Query(ge=-90, le=90)],
+    min_lon: Annotated[float, Query(ge=-180, le=180)],
+    max_lat: Annotated[float, Query(ge=-90, le=90)],
+    max_lon: Annotated[float, Query(ge=-180, le=180)],
+    indicator: Annotated[
+        str | None, Query(description="Indicator code of an active sensor, e.g. PM2.5")
+    ] = None,
+) -> list[schemes.StationSchema]:
+    """Endpoint do pobrania czynnych stacji w prostokącie widoku mapy."""
+    index = station_index.get(await metadata_snapshot.get_async())
+    return JSONResponse(index.within(min_lat, min_lon, max_lat, max_lon, indicator))
+
 
 @router.get("/stations/{station_code}")
-def get_station_by_code(
+async def get_station_by_code(
     station_code: str,
-    db: Session = Depends(get_db),
 )-> schemes.StationSchema:
-    station = db.query(models.Station).filter(models.Station.code == station_code).first()
+    snapshot = await metadata_snapshot.get_async()
+    station = snapshot.station_json.get(station_code)
 
     if not station:
         raise HTTPException(status_code=404, detail="Stacja nie znaleziona")
 
-    return station
+    return JSONResponse(station)
 
 
 @router.get("/check_sensors_with_data", tags=['Fetch data from GIOS'])
-async def check_sensors_with_data(
-    db: Session = Depends(get_db),
-):
-    db.query(models.Sensor).update({models.Sensor.is_active: False})
-    db.commit()
-    await GiosAPI.check_sensors_with_data(db=db)
-    return "ok"
+async def check_sensors_with_data() -> schemes.JobSchema:
+    """Endpoint do uruchomienia w tle sprawdzania, które czujniki mają dane."""
+    job = await asyncio.to_thread(find_running_job, "check_sensors_with_data")
+    if not job:
+        job = await start_job(
+            "check_sensors_with_data",
+            lambda job: run_exclusive(SENSOR_CHECK_LOCK, GiosAPI.check_sensors_with_data, job),
+        )
+    return job
 
 
-@router.get("/stations/by-active-sensors")
-def get_stations_by_active_sensors(db: Session = Depends(get_db)):
-    stations = db.query(models.Station).all()
-    stations_sorted = sorted(
-        stations, key=lambda station: station.count_working_sensors, reverse=True
-    )
-    return [
-        {
-            "station_id": station.id,
-            "station_code": station.code,
-            "station_name": station.name,
-            "active_sensors_count": station.count_working_sensors,
-        }
-        for station in [
-            station for station in stations_sorted if station.count_working_sensors > 0
-        ]
-    ]
+@router.get("/jobs/{job_id}", tags=['Fetch data from GIOS'])
+def get_job_status(job_id: str) -> schemes.JobSchema:
+    """Endpoint do sprawdzenia postępu zadania działającego w tle."""
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Nie znaleziono zadania o id: {job_id}",
+        )
+    return job
 
 
 @router.get("/sensors/active")
-def get_sensors_from_top_stations(
-    db: Session = Depends(get_db),
+async def get_sensors_from_top_stations(
+    db: AsyncSession = Depends(get_async_db),
 ):
     # Podzapytanie: zlicz ile aktywnych sensorów ma każda stacja
     station_sensor_counts = (
-        db.query(
+        select(
             models.Sensor.station_code,
             func.count(models.Sensor.id).label("active_sensor_count"),
         )
-        .filter(
+        .where(
             models.Sensor.is_active == True,
             models.Sensor.measurement_type == "automatyczny",
         )
@@ -300,70 +364,286 @@ def get_sensors_from_top_stations(
     )
 
     # Główne zapytanie: pobierz ID sensorów tylko z tych stacji
-    sensor_ids = (
-        db.query(models.Sensor.id)
+    sensor_ids = await db.scalars(
+        select(models.Sensor.id)
         .join(
             station_sensor_counts,
             models.Sensor.station_code == station_sensor_counts.c.station_code,
         )
-        .filter(
+        .where(
             models.Sensor.is_active == True,
             models.Sensor.measurement_type == "automatyczny",
         )
-        .all()
     )
 
-    return {"sensor_ids": [s.id for s in sensor_ids]}
+    return {"sensor_ids": list(sensor_ids)}
 
 
-def fetch_data_periodically(sensor_ids, db):
-    """Funkcja do cyklicznego pobierania danych."""
-    while True:
-        GiosAPI.fetch_measurement_data_for_sensors(sensor_ids=sensor_ids, db=db)
-        time.sleep(15 * 60)  # 15 minut
-
 @router.post("/fetch-sensors-measurements/", tags=['Fetch data from GIOS'])
 def start_fetching(
-    sensor_ids: schemes.SensorIds, 
-    background_tasks: BackgroundTasks, 
-    db: Session = Depends(get_db)
+    subscription: schemes.IngestionSubscription,
+    db: Session = Depends(get_db),
 ):
     """Endpoint do uruchamiania cyklicznego pobierania danych o pomiarow z czujnikow z podanymi id."""
-    background_tasks.add_task(fetch_data_periodically, sensor_ids.model_dump().get('sensor_ids', []), db)
-    return {"message": "Rozpoczęto cykliczne pobieranie danych dla podanych czujników."}
+    known = set(
+        db.scalars(select(models.Sensor.id).where(models.Sensor.id.in_(subscription.sensor_ids)))
+    )
+    unknown = sorted(set(subscription.sensor_ids) - known)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Nie znaleziono czujników o id: {unknown}",
+        )
+
+    count = subscribe_sensors(
+        db, subscription.sensor_ids, subscription.interval_minutes * 60
+    )
+    return {
+        "message": "Rozpoczęto cykliczne pobieranie danych dla podanych czujników.",
+        "scheduled_sensors": count,
+    }
+
+
+@router.get("/fetch-sensors-measurements/workers", tags=['Fetch data from GIOS'])
+def get_ingestion_workers(db: Session = Depends(get_db)):
+    """Endpoint do podglądu workerów pobierających pomiary i przydzielonych im shardów."""
+    return coordination_status(db)
+
+
+@router.get("/fetch-sensors-measurements/schedules", tags=['Fetch data from GIOS'])
+async def get_ingestion_schedules(
+    include_paused: Annotated[
+        bool, Query(description="Include paused schedules")
+    ] = True,
+    db: AsyncSession = Depends(get_async_db),
+) -> Page[schemes.IngestionScheduleSchema]:
+    """Endpoint do pobrania harmonogramów cyklicznego pobierania pomiarów."""
+    query = select(models.IngestionSchedule)
+
+    if not include_paused:
+        query = query.where(models.IngestionSchedule.is_paused == False)
+
+    return await paginate(db, query.order_by(models.IngestionSchedule.next_due_at))
+
+
+def _set_schedule_paused(db: Session, sensor_id: int, is_paused: bool):
+    schedule = set_schedule_paused(db, sensor_id, is_paused)
+    if not schedule:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Nie znaleziono harmonogramu dla czujnika o id: {sensor_id}",
+        )
+    return schedule
+
+
+@router.post("/fetch-sensors-measurements/schedules/{sensor_id}/pause", tags=['Fetch data from GIOS'])
+def pause_ingestion_schedule(
+    sensor_id: int,
+    db: Session = Depends(get_db),
+) -> schemes.IngestionScheduleSchema:
+    """Endpoint do wstrzymania cyklicznego pobierania pomiarów dla czujnika."""
+    return _set_schedule_paused(db, sensor_id, True)
+
+
+@router.post("/fetch-sensors-measurements/schedules/{sensor_id}/resume", tags=['Fetch data from GIOS'])
+def resume_ingestion_schedule(
+    sensor_id: int,
+    db: Session = Depends(get_db),
+) -> schemes.IngestionScheduleSchema:
+    """Endpoint do wznowienia cyklicznego pobierania pomiarów dla czujnika."""
+    return _set_schedule_paused(db, sensor_id, False)
+
+
+@router.delete("/fetch-sensors-measurements/schedules/{sensor_id}", tags=['Fetch data from GIOS'])
+def cancel_ingestion_schedule(
+    sensor_id: int,
+    db: Session = Depends(get_db),
+):
+    """Endpoint do anulowania cyklicznego pobierania pomiarów dla czujnika."""
+    if not cancel_schedule(db, sensor_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Nie znaleziono harmonogramu dla czujnika o id: {sensor_id}",
+        )
+    return {"message": f"Anulowano cykliczne pobieranie danych dla czujnika {sensor_id}."}
 
 
 @router.get("/measurements/{sensor_id}")
-def get_measurements_by_date(
+async def get_measurements_by_date(
     sensor_id: int,
     date_filter: date = Query(None, description="Format: YYYY-MM-DD"),
-    db: Session = Depends(get_db),
-) -> Page[schemes.MeasurementSchema]:
+    paging: Annotated[
+        Literal["offset", "cursor"],
+        Query(description="Offset pages or cursor (keyset) pages"),
+    ] = "offset",
+    cursor: Annotated[
+        str | None, Query(description="Cursor returned as next_cursor by the previous page")
+    ] = None,
+    include_total: Annotated[
+        bool, Query(description="Count all matching rows (cursor paging only)")
+    ] = False,
+    params: Params = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+) -> Page[schemes.MeasurementSchema] | CursorPage[schemes.MeasurementSchema]:
     """Endpoint do pobierania pomiarów z danego dnia."""
-    query = db.query(models.Measurement).filter(models.Measurement.sensor_id == sensor_id)
-    
+    query = select(models.Measurement).where(models.Measurement.sensor_id == sensor_id)
+
     if date_filter:
         start = datetime.combine(date_filter, datetime.min.time())
         end = datetime.combine(date_filter, datetime.max.time())
-        query = query.filter(models.Measurement.timestamp.between(start, end))
+        query = query.where(models.Measurement.timestamp.between(start, end))
 
-    query = query.order_by(desc(models.Measurement.timestamp))
-    return paginate(query)
+    if paging == "offset" and cursor is None:
+        query = query.order_by(desc(models.Measurement.timestamp))
+        return await paginate(db, query, params)
 
+    # Stronicowanie po (timestamp, id) - koszt strony nie zależy od jej numeru
+    total = (
+        await db.scalar(select(func.count()).select_from(query.subquery()))
+        if include_total
+        else None
+    )
+    if cursor:
+        position = decode_cursor(cursor, TimestampIdCursor)
+        query = query.where(
+            tuple_(models.Measurement.timestamp, models.Measurement.id)
+            < tuple_(literal(position.timestamp), literal(position.id))
+        )
 
+    measurements = (
+        await db.scalars(
+            query.order_by(desc(models.Measurement.timestamp), desc(models.Measurement.id))
+            .limit(params.size + 1)
+        )
+    ).all()
+    measurements, next_cursor = keyset_page(
+        measurements,
+        params.size,
+        lambda m: {"timestamp": m.timestamp.isoformat(), "id": m.id},
+    )
+    return CursorPage[schemes.MeasurementSchema](
+        items=[
+            schemes.MeasurementSchema.model_validate(m, from_attributes=True)
+            for m in measurements
+        ],
+        next_cursor=next_cursor,
+        total=total,
+    )
 
-@router.get("/measurements/latest/{sensor_id}")
-def get_latest_measurement_by_sensor_id(
+
+
+@router.get("/measurements/{sensor_id}/aggregate")
+async def get_measurement_aggregates(
+    sensor_id: int,
+    bucket: Annotated[
+        Literal["hour", "day", "month"], Query(description="Aggregation bucket")
+    ] = "day",
+    date_from: Annotated[datetime | None, Query(alias="from")] = None,
+    date_to: Annotated[datetime | None, Query(alias="to")] = None,
+    db: AsyncSession = Depends(get_async_db),
+) -> list[schemes.AggregateSchema]:
+    """Endpoint do pobierania zagregowanych pomiarów (godzinowych, dziennych, miesięcznych)."""
+    query = select(models.MeasurementRollup).where(
+        models.MeasurementRollup.sensor_id == sensor_id,
+        models.MeasurementRollup.bucket == bucket,
+    )
+
+    if date_from:
+        query = query.where(models.MeasurementRollup.bucket_start >= truncate(date_from, bucket))
+    if date_to:
+        query = query.where(models.MeasurementRollup.bucket_start <= date_to)
+
+    rollups = await db.scalars(query.order_by(models.MeasurementRollup.bucket_start))
+    return [summarize_rollup(rollup) for rollup in rollups]
+
+
+@router.post("/measurements/batch")
+def get_measurements_batch(
+    request: schemes.BatchMeasurementsRequest,
+    db: Session = Depends(get_db),
+) -> schemes.BatchMeasurementsSchema:
+    """
+    Endpoint do pobrania pomiarów wielu czujników jednym zapytaniem.
+    Odpowiedź jest kolumnowa: wspólna oś czasu i tablica wartości każdego
+    czujnika (null tam, gdzie czujnik nie ma pomiaru).
+    """
+    from app.timeseries import align_series, load_series, nan_to_none
+
+    series = load_series(db, request.sensor_ids, request.start_time, request.end_time)
+    timestamps, aligned = align_series(series)
+    return {
+        "timestamps": timestamps.tolist(),
+        "values": {sensor_id: nan_to_none(values) for sensor_id, values in aligned.items()},
+    }
+
+
+@router.post("/measurements/resample")
+def resample_measurements(
+    request: schemes.ResampleRequest,
+    db: Session = Depends(get_db),
+) -> schemes.ResampleSchema:
+    """
+    Endpoint do pobrania pomiarów wielu czujników na wspólnej siatce czasu
+    (godzina lub dzień) z wybranym uzupełnianiem luk oraz liczbą pomiarów
+    w każdej komórce.
+    """
+    from app.timeseries import check_grid_size, fill_gaps, load_series, nan_to_none, resample
+
+    start = truncate(request.start_time, request.step)
+    # Rozmiar siatki sprawdzamy przed pobraniem pomiarów i alokacją tablic
+    try:
+        check_grid_size(start, request.end_time, request.step, len(request.sensor_ids))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    series = load_series(db, request.sensor_ids, start, request.end_time)
+    grid, values, coverage = resample(series, start, request.end_time, request.step)
+
+    return {
+        "step": request.step,
+        "fill": request.fill,
+        "timestamps": grid.tolist(),
+        "values": {
+            sensor_id: nan_to_none(fill_gaps(column, request.fill, request.limit))
+            for sensor_id, column in values.items()
+        },
+        "coverage": {sensor_id: counts.tolist() for sensor_id, counts in coverage.items()},
+    }
+
+
+@router.get("/measurements/{sensor_id}/series")
+def get_measurement_series(
     sensor_id: int,
+    date_from: Annotated[datetime | None, Query(alias="from")] = None,
+    date_to: Annotated[datetime | None, Query(alias="to")] = None,
+    points: Annotated[int, Query(ge=3, le=10000, description="Maximum number of points")] = 500,
+    method: Annotated[
+        Literal["lttb", "minmax"], Query(description="Downsampling method")
+    ] = "lttb",
     db: Session = Depends(get_db),
+) -> schemes.SeriesSchema:
+    """Endpoint do pobrania serii pomiarów zmniejszonej do podanej liczby punktów (do wykresów)."""
+    from app.timeseries import downsample, load_series
+
+    timestamps, values = load_series(db, [sensor_id], date_from, date_to)[sensor_id]
+    total = len(values)
+    timestamps, values = downsample(timestamps, values, points, method)
+    return {
+        "sensor_id": sensor_id,
+        "method": method,
+        "total": total,
+        "timestamps": timestamps.tolist(),
+        "values": values.tolist(),
+    }
+
+
+@router.get("/measurements/latest/{sensor_id}")
+async def get_latest_measurement_by_sensor_id(
+    sensor_id: int,
+    db: AsyncSession = Depends(get_async_db),
 ) -> schemes.MeasurementSchema:
     """Endpoint do pobrania najnowszego pomiaru dla podanego ID czujnika."""
-    latest_measurement = (
-        db.query(models.Measurement)
-        .filter(models.Measurement.sensor_id == sensor_id)
-        .order_by(desc(models.Measurement.timestamp))
-        .first()
-    )
+    latest_measurement = (await get_latest_measurements(db, [sensor_id])).get(sensor_id)
     if not latest_measurement:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -372,199 +652,133 @@ def get_latest_measurement_by_sensor_id(
     return latest_measurement
 
 @router.post("/station/generate-pdf-report/{station_id}", tags=["Generate report"])
-def generate_pdf_station_report_by_station_id(
+async def generate_pdf_station_report_by_station_id(
     station_id: int,
     report: schemes.ReportSchema,
-    db: Session = Depends(get_db)
-):
-    pdfmetrics.registerFont(TTFont("DejaVuSans", "./DejaVuSans.ttf"))
-
-    station = db.query(models.Station).filter(models.Station.id == station_id).first()
-    if not station:
-        raise HTTPException(status=status.HTTP_404_NOT_FOUND, 
-                            detail=f"Nie znaleziono żadnego pomiaru dla stacji o id: {station_id}")
-
-    sensors = db.query(models.Sensor).filter(models.Sensor.id.in_(report.sensor_ids)).all()
-
-    sensor_data = {}
-    for sensor in sensors:
-        measurements = db.query(models.Measurement).filter(
-            models.Measurement.sensor_id == sensor.id,
-            models.Measurement.timestamp >= report.start_time,
-            models.Measurement.timestamp <= report.end_time
-        ).order_by(models.Measurement.timestamp).all()
-        sensor_data[sensor] = measurements
-
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    styles = getSampleStyleSheet()
-    # Definicja przykładowego stylu tabeli
-    table_style = TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
-        ("TEXTCOLOR", (0, 0), (-1, 0), colors.black),
-        ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-        ("FONTNAME", (0, 0), (-1, -1), "DejaVuSans"),
-        ("FONTSIZE", (0, 0), (-1, -1), 9),
-        ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
-        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-    ])
-
-    # Zastosujemy też lepsze odstępy i wyraźniejsze tytuły stron:
-    title_style = ParagraphStyle(
-        "Tytul",
-        parent=styles["Title"],
-        fontName="DejaVuSans",
-        fontSize=20,
-        alignment=1,  # center
-        spaceAfter=20,
-    )
+) -> schemes.JobSchema:
+    """
+    Endpoint do zlecenia raportu PDF stacji. Zwraca zadanie - gotowy plik pobiera
+    się z /reports/{job_id}. Raport dla niezmienionych danych zwracany jest od razu.
+    """
+    try:
+        return await submit_report(station_id, report.sensor_ids, report.start_time, report.end_time)
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
-    section_title = ParagraphStyle(
-        "Sekcja",
-        parent=styles["Heading2"],
-        fontName="DejaVuSans",
-        fontSize=14,
-        textColor=colors.darkblue,
-        spaceAfter=10,
-        spaceBefore=20,
-    )
 
-    text_style = ParagraphStyle(
-        "Normalny",
-        parent=styles["Normal"],
-        fontName="DejaVuSans",
-        fontSize=10,
-        spaceAfter=6,
-    )
+@router.get("/reports/{job_id}", tags=["Generate report"])
+def download_pdf_report(job_id: str):
+    """Endpoint do pobrania raportu PDF wygenerowanego przez zadanie."""
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Nie znaleziono zadania o id: {job_id}",
+        )
+    if job.status in ("pending", "running"):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Raport nie jest jeszcze gotowy (status: {job.status})",
+        )
 
-    italic_style = ParagraphStyle(
-        "Italic",
-        parent=styles["Italic"],
-        fontName="DejaVuSans",
-        fontSize=10,
-        textColor=colors.grey,
-        spaceAfter=6,
-    )
-    # Dodane własne style
-    for style in styles.byName.values():
-        style.fontName = "DejaVuSans"
-
-    title_style = ParagraphStyle("Tytul", parent=styles["Title"], fontSize=24, alignment=1, spaceAfter=20)
-    section_style = ParagraphStyle("Sekcja", parent=styles["Heading1"], fontSize=18, textColor=colors.black, spaceBefore=10, spaceAfter=10)
-    normal_style = ParagraphStyle("Normalny", parent=styles["Normal"], fontSize=11, spaceAfter=6)
-    italic_style = ParagraphStyle("Italic", parent=styles["Italic"], fontSize=11, textColor=colors.grey, spaceAfter=6)
-
-    elements = []
-
-    # ✅ STRONA TYTUŁOWA – ROZBUDOWANA I CZYTELNA
-    elements.append(Spacer(1, 50))
-    elements.append(Paragraph("Raport ze stacji pomiarowej", title_style))
-    elements.append(Spacer(1, 30))
-
-    elements.append(Paragraph(
-        f"Raport obejmuje dane pomiarowe zarejestrowane przez stację <b>{station.name}</b> "
-        f"(kod: {station.code}), zlokalizowaną w miejscowości {station.city}, województwie {station.voivodeship}, "
-        f"pod adresem: {station.address}. W momencie generowania raportu stacja posiada "
-        f"{station.count_working_sensors} aktywnych czujników automatycznych, spośród wszystkich {len(station.sensors)} zainstalowanych czujników. "
-        f"Łącznie zgromadzono {sum(len(sensor.measurements) for sensor in station.sensors)} pomiarów. "
-        f"Zakres czasowy raportu obejmuje okres od {report.start_time.strftime('%Y-%m-%d %H:%M')} do {report.end_time.strftime('%Y-%m-%d %H:%M')}. "
-        f"Dokument zawiera szczegółowe informacje o czujnikach, statystyki wyników (min, max, średnia, mediana) oraz wykresy pomiarów. "
-        f"Dane wykorzystywane w raporcie pochodzą z publicznego interfejsu API Głównego Inspektoratu Ochrony Środowiska, "
-        f"dostępnego pod adresem: <a href='https://api.gios.gov.pl/pjp-api/swagger-ui/#/'>https://api.gios.gov.pl/pjp-api/swagger-ui/#/</a>. "
-        f"Źródło to stanowi oficjalne i wiarygodne repozytorium danych o jakości powietrza w Polsce.",
-        normal_style
-    ))
-
-    # ✅ STRONY Z CZUJNIKAMI
-    for sensor, measurements in sensor_data.items():
-        elements.append(Paragraph(f"Czujnik: {sensor.indicator_name}", section_style))
-        elements.append(Paragraph(f"Uśrednianie: {sensor.averaging_time}", normal_style))
-        elements.append(Paragraph(f"Aktywny: {'Tak' if sensor.is_active else 'Nie'}", normal_style))
-        elements.append(Paragraph(f"Liczba pomiarów: {len(measurements)}", normal_style))
-
-        if measurements:
-            values = [m.value for m in measurements]
-
-            stats = {
-                "Min": round(min(values), 2),
-                "Max": round(max(values), 2),
-                "Średnia": round(mean(values), 2),
-                "Mediana": round(median(values), 2)
-            }
-
-            # Średni odstęp czasu
-            if len(measurements) > 1:
-                deltas = [
-                    (measurements[i + 1].timestamp - measurements[i].timestamp).total_seconds() / 3600
-                    for i in range(len(measurements) - 1)
-                ]
-                avg_interval = round(mean(deltas), 2)
-                elements.append(Paragraph(f"Średni odstęp pomiarów: {avg_interval} godz.", normal_style))
-
-            stats_text = ", ".join([f"{k}: {v}" for k, v in stats.items()])
-            elements.append(Paragraph(f"Statystyki: {stats_text}", normal_style))
-
-            chart = generate_plot(measurements, sensor.indicator_name)
-            hist = generate_histogram(measurements, sensor.indicator_name)
-
-            elements.append(Image(chart, width=400, height=200))
-            elements.append(Spacer(1, 10))
-            elements.append(Image(hist, width=400, height=200))
-        else:
-            elements.append(Paragraph("Brak danych pomiarowych w podanym okresie.", italic_style))
-
-        elements.append(PageBreak())
-
-
-    doc.build(elements, onFirstPage=add_metadata)
-    buffer.seek(0)
+    report = get_report(job)
+    if report is None:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Raport jest niedostępny - zleć jego wygenerowanie ponownie",
+        )
 
+    pdf, filename = report
     return Response(
-        content=buffer.read(),
+        content=pdf,
         media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=raport_stacji_{station.code}.pdf"}
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
+@router.post("/station/statistics/{station_id}", tags=["Generate report"])
+def get_station_statistics(
+    station_id: int,
+    report: schemes.ReportSchema,
+    db: Session = Depends(get_db)
+) -> list[schemes.SensorStatisticsSchema]:
+    """Endpoint do pobrania statystyk pomiarów czujników stacji w podanym okresie."""
+    station = db.query(models.Station).filter(models.Station.id == station_id).first()
+    if not station:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"Nie znaleziono stacji o id: {station_id}")
+
+    sensor_ids = [
+        sensor_id
+        for (sensor_id,) in db.query(models.Sensor.id).filter(
+            models.Sensor.id.in_(report.sensor_ids),
+            models.Sensor.station_code == station.code
+        )
+    ]
+    statistics = sensor_statistics(db, sensor_ids, report.start_time, report.end_time)
+    return [
+        {"sensor_id": sensor_id, **sensor_stats}
+        for sensor_id, sensor_stats in sorted(statistics.items())
+    ]
+
 @router.post("/station/generate-csv-report/{station_id}", tags=['Generate report'])
 def generate_csv_station_report_by_station_id(
     station_id: int,
     report: schemes.ReportSchema,
+    gzip: Annotated[bool, Query(description="Compress the report with gzip")] = False,
     db: Session = Depends(get_db)
 ):
     station = db.query(models.Station).filter(models.Station.id == station_id).first()
     if not station:
-        raise HTTPException(status=status.HTTP_404_NOT_FOUND, 
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, 
                             detail=f"Nie znaleziono żadnego pomiaru dla stacji o id: {station_id}")
 
-    sensors = db.query(models.Sensor).filter(
-        models.Sensor.id.in_(report.sensor_ids),
-        models.Sensor.station_code == station.code
-    ).all()
+    sensor_ids = [
+        sensor_id
+        for (sensor_id,) in db.query(models.Sensor.id).filter(
+            models.Sensor.id.in_(report.sensor_ids),
+            models.Sensor.station_code == station.code
+        )
+    ]
 
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["timestamp", "station_name", "sensor_name", "sensor_code", "value"])
+    filename = f"raport_stacji_{station.code}.csv" + (".gz" if gzip else "")
+    return StreamingResponse(
+        iter_csv(sensor_ids, report.start_time, report.end_time, compress=gzip),
+        media_type="application/gzip" if gzip else "text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
 
-    for sensor in sensors:
-        measurements = db.query(models.Measurement).filter(
-            models.Measurement.sensor_id == sensor.id,
-            models.Measurement.timestamp >= report.start_time,
-            models.Measurement.timestamp <= report.end_time
-        ).order_by(models.Measurement.timestamp).all()
 
-        for m in measurements:
-            writer.writerow([
-                m.timestamp.isoformat(),
-                station.name,
-                sensor.indicator_name,
-                sensor.code,
-                m.value
-            ])
+@router.post("/stations/generate-columnar-report", tags=['Generate report'])
+def generate_columnar_report_by_station_ids(
+    report: schemes.ColumnarReportSchema,
+    format: Annotated[
+        Literal["parquet", "arrow"], Query(description="Parquet or Arrow IPC stream")
+    ] = "parquet",
+    db: Session = Depends(get_db)
+):
+    """Endpoint do eksportu pomiarów wielu stacji w formacie kolumnowym (Parquet / Arrow IPC)."""
+    query = (
+        db.query(models.Sensor.id, models.Sensor.station_code, models.Sensor.indicator_code)
+        .join(models.Station, models.Station.code == models.Sensor.station_code)
+        .filter(models.Station.id.in_(report.station_ids))
+    )
+    if report.sensor_ids:
+        query = query.filter(models.Sensor.id.in_(report.sensor_ids))
 
-    output.seek(0)
+    sensors = [tuple(row) for row in query]
+    if not sensors:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Nie znaleziono czujników dla podanych stacji",
+        )
 
+    extension, media_type = (
+        ("parquet", "application/vnd.apache.parquet")
+        if format == "parquet"
+        else ("arrows", "application/vnd.apache.arrow.stream")
+    )
     return StreamingResponse(
-        output,
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename=raport_stacji_{station.code}.csv"}
-    )
\ No newline at end of file
+        iter_columnar(sensors, report.start_time, report.end_time, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=raport_stacji.{extension}"}
+    )
@@ -0,0 +1,250 @@
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, func, literal, DateTime, Interval
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.coordination import AdvisoryLock, PARTITION_MAINTENANCE_LOCK, coordinator, shard_of
+from app.database import SessionLocal, engine
+from app.ingestion import ingest_measurements
+from app.models import IngestionSchedule
+from app.partitions import run_maintenance
+
+
+def initial_offset(sensor_id: int, interval_seconds: int) -> timedelta:
+    """
+    Rozkłada pierwsze uruchomienia sensorów równomiernie w obrębie interwału,
+    żeby wszystkie sensory nie były pobierane w tej samej chwili.
+    """
+    # Mnożenie przez stałą Knutha rozprasza kolejne identyfikatory
+    return timedelta(seconds=(sensor_id * 2654435761) % interval_seconds)
+
+
+def subscribe_sensors(db: Session, sensor_ids: list[int], interval_seconds: int) -> int:
+    """
+    Dodaje harmonogramy pobierania dla sensorów.
+    Sensor subskrybowany kilka razy ma jeden harmonogram - zostaje krótszy interwał,
+    a wstrzymany harmonogram zostaje wznowiony.
+    """
+    now = datetime.now()
+    rows = [
+        {
+            "sensor_id": sensor_id,
+            "interval_seconds": interval_seconds,
+            "next_due_at": now + initial_offset(sensor_id, interval_seconds),
+            "failure_count": 0,
+            "is_paused": False,
+        }
+        for sensor_id in set(sensor_ids)
+    ]
+    if not rows:
+        return 0
+
+    stmt = insert(IngestionSchedule).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[IngestionSchedule.sensor_id],
+        set_={
+            "interval_seconds": func.least(
+                IngestionSchedule.interval_seconds, stmt.excluded.interval_seconds
+            ),
+            "is_paused": False,
+        },
+    )
+    db.execute(stmt)
+    db.commit()
+    return len(rows)
+
+
+def set_schedule_paused(db: Session, sensor_id: int, is_paused: bool) -> IngestionSchedule | None:
+    """Wstrzymuje lub wznawia harmonogram sensora."""
+    schedule = db.get(IngestionSchedule, sensor_id)
+    if schedule:
+        schedule.is_paused = is_paused
+        if not is_paused:
+            schedule.next_due_at = datetime.now()
+        db.commit()
+    return schedule
+
+
+def cancel_schedule(db: Session, sensor_id: int) -> bool:
+    """Usuwa harmonogram sensora."""
+    deleted = db.query(IngestionSchedule).filter_by(sensor_id=sensor_id).delete()
+    db.commit()
+    return bool(deleted)
+
+
+def claim_due_sensors(limit: int) -> list[int]:
+    """
+    Pobiera sensory, których termin minął, i od razu przesuwa ich kolejny termin
+    o interwał, żeby następny cykl nie pobrał ich ponownie w trakcie pobierania.
+    Pobierane są tylko sensory z shardów, których dzierżawa tego workera jest
+    ważna, więc ten sam sensor nie jest pobierany przez dwa procesy.
+    """
+    now = datetime.now()
+    db = SessionLocal()
+    try:
+        due = (
+            select(IngestionSchedule.sensor_id)
+            .where(
+                IngestionSchedule.is_paused == False,
+                IngestionSchedule.next_due_at <= now,
+                shard_of(IngestionSchedule.sensor_id).in_(coordinator.held_shards_query()),
+            )
+            .order_by(IngestionSchedule.next_due_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        interval = func.make_interval(
+            0, 0, 0, 0, 0, 0, IngestionSchedule.interval_seconds, type_=Interval
+        )
+        stmt = (
+            update(IngestionSchedule)
+            .where(IngestionSchedule.sensor_id.in_(due.scalar_subquery()))
+            .values(next_due_at=literal(now, DateTime) + interval)
+            .returning(IngestionSchedule.sensor_id)
+        )
+        sensor_ids = list(db.execute(stmt).scalars())
+        db.commit()
+        return sensor_ids
+    finally:
+        db.close()
+
+
+def record_results(sensor_ids: list[int], errors: dict[int, str]) -> None:
+    """Zapisuje wynik pobierania i odkłada kolejne próby dla sensorów z błędami."""
+    now = datetime.now()
+    db = SessionLocal()
+    try:
+        succeeded = [sensor_id for sensor_id in sensor_ids if sensor_id not in errors]
+        if succeeded:
+            db.execute(
+                update(IngestionSchedule)
+                .where(IngestionSchedule.sensor_id.in_(succeeded))
+                .values(last_success_at=now, failure_count=0, last_error=None)
+            )
+
+        failed = db.query(IngestionSchedule).filter(
+            IngestionSchedule.sensor_id.in_(list(errors))
+        )
+        for schedule in failed:
+            schedule.failure_count += 1
+            schedule.last_error = errors[schedule.sensor_id]
+            backoff = min(
+                60 * 2 ** schedule.failure_count,
+                schedule.interval_seconds,
+                settings.SCHEDULER_MAX_BACKOFF_SECONDS,
+            )
+            schedule.next_due_at = now + timedelta(seconds=backoff)
+
+        db.commit()
+    finally:
+        db.close()
+
+
+def maintain_partitions() -> dict | None:
+    """Utrzymanie partycji w jednym procesie naraz - pozostałe pomijają ten cykl."""
+    with AdvisoryLock(PARTITION_MAINTENANCE_LOCK) as acquired:
+        return run_maintenance(engine) if acquired else None
+
+
+class IngestionScheduler:
+    """
+    Cykliczne pobieranie pomiarów na podstawie harmonogramów zapisanych w bazie.
+    Co SCHEDULER_TICK_SECONDS pobiera sensory, których termin minął, więc
+    praca rozkłada się równomiernie w czasie zamiast co 15 minut naraz.
+    Osobna pętla odnawia dzierżawy shardów (app.coordination), dzięki czemu
+    workery wszystkich replik dzielą sensory między siebie.
+    """
+
+    MAINTENANCE_INTERVAL = timedelta(hours=24)
+
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+        self._heartbeat_task: asyncio.Task | None = None
+        self._last_maintenance: datetime | None = None
+
+    async def start(self) -> None:
+        if settings.SCHEDULER_ENABLED and self._task is None:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat())
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        for task in (self._task, self._heartbeat_task):
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._task = self._heartbeat_task = None
+        try:
+            await asyncio.to_thread(coordinator.leave)
+        except Exception as e:
+            print(f"Błąd zwalniania dzierżaw shardów: {e}")
+
+    async def run_due(self) -> dict | None:
+        if not coordinator.shards:
+            return None
+
+        sensor_ids = await asyncio.to_thread(
+            claim_due_sensors, settings.SCHEDULER_MAX_SENSORS_PER_TICK
+        )
+        if not sensor_ids:
+            return None
+
+        stats = await ingest_measurements(sensor_ids)
+        await asyncio.to_thread(record_results, sensor_ids, stats["errors"])
+
+        print(
+            f"[✓] Pomiary: sensory {stats['sensors']}, dodane {stats['inserted']}, "
+            f"zaktualizowane {stats['updated']}, pominięte {stats['skipped']}, "
+            f"błędy {len(stats['errors'])}, czas {stats['duration_seconds']}s"
+        )
+        return stats
+
+    async def run_maintenance(self) -> None:
+        """Raz na dobę tworzy partycje na kolejne miesiące i usuwa przeterminowane."""
+        now = datetime.now()
+        if (
+            self._last_maintenance is not None
+            and now - self._last_maintenance < self.MAINTENANCE_INTERVAL
+        ):
+            return
+
+        self._last_maintenance = now
+        if settings.MEASUREMENTS_PARTITIONED:
+            result = await asyncio.to_thread(maintain_partitions)
+            if result is not None:
+                print(f"[✓] Partycje pomiarów: {result}")
+
+    async def _heartbeat(self) -> None:
+        while True:
+            previous = coordinator.shards
+            try:
+                shards = await asyncio.to_thread(coordinator.heartbeat)
+            except Exception as e:
+                # Bez odnowienia dzierżawy wygasną, a claim_due_sensors i tak je sprawdza
+                shards = coordinator.shards = frozenset()
+                print(f"Błąd odnawiania dzierżaw shardów: {e}")
+            if shards != previous:
+                print(
+                    f"[✓] Worker {coordinator.worker_id}: "
+                    f"{len(shards)}/{settings.COORDINATION_SHARDS} shardów"
+                )
+            await asyncio.sleep(settings.COORDINATION_HEARTBEAT_SECONDS)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_maintenance()
+            except Exception as e:
+                print(f"Błąd utrzymania partycji: {e}")
+            try:
+                await self.run_due()
+            except Exception as e:
+                print(f"Błąd harmonogramu pobierania: {e}")
+            await asyncio.sleep(settings.SCHEDULER_TICK_SECONDS)
+
+
+scheduler = IngestionScheduler()
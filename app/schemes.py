@@ -1,7 +1,8 @@
 from datetime import date
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import Dict, List, Literal, Optional
+from pydantic import BaseModel, Field
 from datetime import datetime
+from app.config import settings
 
 class MeasurementSchema(BaseModel):
     id: int
@@ -9,6 +10,57 @@ class MeasurementSchema(BaseModel):
     timestamp: datetime
     sensor_id: int
 
+class AggregateSchema(BaseModel):
+    bucket_start: datetime
+    count: int
+    min: float
+    max: float
+    mean: float
+    median: Optional[float]
+    p95: Optional[float]
+
+class SensorIds(BaseModel):
+    sensor_ids: List[int]
+
+class BatchMeasurementsRequest(SensorIds):
+    start_time: datetime
+    end_time: datetime
+
+class BatchMeasurementsSchema(BaseModel):
+    timestamps: List[datetime]
+    values: Dict[int, List[Optional[float]]]
+
+class ResampleRequest(BatchMeasurementsRequest):
+    step: Literal["hour", "day"] = "hour"
+    fill: Literal["none", "ffill", "linear"] = "none"
+    limit: Optional[int] = Field(default=None, ge=1)
+
+class ResampleSchema(BaseModel):
+    step: str
+    fill: str
+    timestamps: List[datetime]
+    values: Dict[int, List[Optional[float]]]
+    coverage: Dict[int, List[int]]
+
+class SeriesSchema(BaseModel):
+    sensor_id: int
+    method: str
+    total: int
+    timestamps: List[datetime]
+    values: List[float]
+
+class SensorStatisticsSchema(BaseModel):
+    sensor_id: int
+    count: int
+    min: float
+    max: float
+    mean: float
+    median: float
+    percentiles: Dict[str, float]
+    first: datetime
+    last: datetime
+    avg_interval_hours: Optional[float]
+
 class SensorSchema(BaseModel):
     id: int
     code: str
@@ -45,9 +97,49 @@ class StationSchema(BaseModel):
         from_attributes = True
 
 
-class SensorIds(BaseModel):
-    sensor_ids: List[int]
+class NearbyStationSchema(StationSchema):
+    distance_km: float
+
 
 class ReportSchema(SensorIds):
     start_time: datetime
     end_time: datetime
+
+
+class IngestionSubscription(SensorIds):
+    interval_minutes: int = Field(default=max(settings.INGEST_INTERVAL_SECONDS // 60, 1), ge=1)
+
+
+class IngestionScheduleSchema(BaseModel):
+    sensor_id: int
+    interval_seconds: int
+    next_due_at: datetime
+    last_success_at: Optional[datetime]
+    last_error: Optional[str]
+    failure_count: int
+    is_paused: bool
+
+    class Config:
+        from_attributes = True
+
+
+class JobSchema(BaseModel):
+    id: str
+    kind: str
+    status: str
+    progress: int
+    total: Optional[int]
+    result: Optional[dict]
+    error: Optional[str]
+    created_at: datetime
+    finished_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
+
+class ColumnarReportSchema(BaseModel):
+    station_ids: List[int]
+    sensor_ids: Optional[List[int]] = None
+    start_time: datetime
+    end_time: datetime
@@ -0,0 +1,157 @@
+import asyncio
+import threading
+import time
+from datetime import date
+from typing import NamedTuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app import schemes
+from app.cache import response_cache, METADATA
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Sensor, Station
+
+
+class StationRecord(NamedTuple):
+    id: int
+    code: str
+    name: str | None
+    start_date: date | None
+    end_date: date | None
+    station_type: str | None
+    area_type: str | None
+    station_kind: str | None
+    voivodeship: str | None
+    city: str | None
+    address: str | None
+    latitude: float
+    longitude: float
+    count_working_sensors: int
+
+
+class SensorRecord(NamedTuple):
+    id: int
+    code: str
+    station_code: str
+    indicator_code: str
+    indicator_name: str
+    averaging_time: str | None
+    measurement_type: str | None
+    start_date: date | None
+    end_date: date | None
+    is_active: bool | None
+
+
+class MetadataSnapshot:
+    """
+    Niezmienna kopia stacji i sensorów w pamięci procesu, z indeksami
+    i gotowymi do wysłania słownikami JSON. Nowa wersja zastępuje starą
+    w całości, więc odczyty nie potrzebują blokad.
+    """
+
+    __slots__ = (
+        "stations",
+        "sensors",
+        "station_by_code",
+        "stations_by_voivodeship",
+        "sensors_by_station",
+        "station_json",
+        "sensor_json",
+        "version",
+        "loaded_at",
+    )
+
+    def __init__(self, stations: list[StationRecord], sensors: list[SensorRecord], version: int):
+        self.stations = tuple(sorted(stations, key=lambda station: station.id))
+        self.sensors = tuple(sorted(sensors, key=lambda sensor: sensor.id))
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+        self.station_by_code = {station.code: station for station in self.stations}
+
+        by_voivodeship: dict[str, list[StationRecord]] = {}
+        for station in self.stations:
+            by_voivodeship.setdefault(station.voivodeship, []).append(station)
+        self.stations_by_voivodeship = {k: tuple(v) for k, v in by_voivodeship.items()}
+
+        by_station: dict[str, list[SensorRecord]] = {}
+        for sensor in self.sensors:
+            by_station.setdefault(sensor.station_code, []).append(sensor)
+        self.sensors_by_station = {k: tuple(v) for k, v in by_station.items()}
+
+        self.station_json = {
+            station.code: schemes.StationSchema.model_validate(station._asdict()).model_dump(mode="json")
+            for station in self.stations
+        }
+        self.sensor_json = {
+            sensor.id: schemes.SensorSchema.model_validate(sensor._asdict()).model_dump(
+                mode="json", exclude={"latest_measurement"}
+            )
+            for sensor in self.sensors
+        }
+
+
+def load_snapshot(db: Session) -> MetadataSnapshot:
+    """Wczytuje stacje i sensory dwoma zapytaniami o kolumny, bez obiektów ORM."""
+    version = response_cache.version(METADATA)
+    stations = [
+        StationRecord(*row)
+        for row in db.execute(select(*(getattr(Station, f) for f in StationRecord._fields)))
+    ]
+    sensors = [
+        SensorRecord(*row)
+        for row in db.execute(select(*(getattr(Sensor, f) for f in SensorRecord._fields)))
+    ]
+    return MetadataSnapshot(stations, sensors, version)
+
+
+class SnapshotHolder:
+    """
+    Przechowuje aktualną migawkę metadanych. Po synchronizacji stacji, sensorów
+    i sprawdzeniu aktywności migawka jest wczytywana od razu (reload). Inne
+    workery wykrywają zmianę po wersji METADATA albo po upływie TTL.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._snapshot: MetadataSnapshot | None = None
+        self._lock = threading.Lock()
+
+    def is_stale(self) -> bool:
+        snapshot = self._snapshot
+        return (
+            snapshot is None
+            or snapshot.version != response_cache.version(METADATA)
+            or time.monotonic() - snapshot.loaded_at > self.ttl
+        )
+
+    def _load(self, db: Session | None) -> MetadataSnapshot:
+        if db is not None:
+            return load_snapshot(db)
+        session = SessionLocal()
+        try:
+            return load_snapshot(session)
+        finally:
+            session.close()
+
+    def reload(self, db: Session | None = None) -> MetadataSnapshot:
+        """Wczytuje migawkę od nowa i podmienia ją w całości."""
+        with self._lock:
+            self._snapshot = self._load(db)
+            return self._snapshot
+
+    def get(self) -> MetadataSnapshot:
+        if self.is_stale():
+            with self._lock:
+                if self.is_stale():
+                    self._snapshot = self._load(None)
+        return self._snapshot
+
+    async def get_async(self) -> MetadataSnapshot:
+        """Jak get, ale ewentualne wczytanie z bazy odbywa się poza pętlą zdarzeń."""
+        if self.is_stale():
+            return await asyncio.to_thread(self.get)
+        return self._snapshot
+
+
+metadata_snapshot = SnapshotHolder(settings.METADATA_SNAPSHOT_TTL_SECONDS)
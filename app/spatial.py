@@ -0,0 +1,149 @@
+import heapq
+import math
+import threading
+from typing import Callable
+from app.snapshot import MetadataSnapshot, metadata_snapshot
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def to_unit_vector(latitude: float, longitude: float) -> tuple[float, float, float]:
+    """Punkt na sferze jako wektor jednostkowy - odległość euklidesowa rośnie z odległością po sferze."""
+    lat, lon = math.radians(latitude), math.radians(longitude)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def chord_to_km(squared_chord: float) -> float:
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(squared_chord) / 2))
+
+
+class KDTree:
+    """Drzewo k-d nad punktami 3D, z zapytaniem o k najbliższych spełniających warunek."""
+
+    def __init__(self, points: list[tuple[float, float, float]]):
+        self.points = points
+        # Węzeł: (indeks punktu, oś podziału, lewe poddrzewo, prawe poddrzewo)
+        self.nodes: list[tuple[int, int, int, int]] = []
+        self.root = self._build(list(range(len(points))), 0)
+
+    def _build(self, ids: list[int], depth: int) -> int:
+        if not ids:
+            return -1
+        axis = depth % 3
+        ids = sorted(ids, key=lambda i: self.points[i][axis])
+        middle = len(ids) // 2
+        left = self._build(ids[:middle], depth + 1)
+        right = self._build(ids[middle + 1:], depth + 1)
+        self.nodes.append((ids[middle], axis, left, right))
+        return len(self.nodes) - 1
+
+    def nearest(
+        self, target: tuple[float, float, float], k: int, accept: Callable[[int], bool]
+    ) -> list[tuple[float, int]]:
+        """Zwraca pary (kwadrat odległości, indeks punktu) posortowane rosnąco."""
+        heap: list[tuple[float, int]] = []  # kopiec maksimum przez ujemne odległości
+
+        def visit(node: int) -> None:
+            if node == -1:
+                return
+            index, axis, left, right = self.nodes[node]
+            point = self.points[index]
+
+            if accept(index):
+                distance = (
+                    (point[0] - target[0]) ** 2
+                    + (point[1] - target[1]) ** 2
+                    + (point[2] - target[2]) ** 2
+                )
+                if len(heap) < k:
+                    heapq.heappush(heap, (-distance, index))
+                elif distance < -heap[0][0]:
+                    heapq.heapreplace(heap, (-distance, index))
+
+            diff = target[axis] - point[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            visit(near)
+            if len(heap) < k or diff * diff < -heap[0][0]:
+                visit(far)
+
+        visit(self.root)
+        return sorted((-distance, index) for distance, index in heap)
+
+
+class StationIndex:
+    """Niezmienny indeks przestrzenny czynnych stacji z kodami wskaźników ich aktywnych czujników."""
+
+    def __init__(self, stations: list[dict], indicators: dict[str, set[str]]):
+        self.stations = stations
+        self.indicators = [indicators.get(station["code"], set()) for station in stations]
+        self.tree = KDTree(
+            [to_unit_vector(station["latitude"], station["longitude"]) for station in stations]
+        )
+
+    def nearest(self, latitude: float, longitude: float, k: int, indicator: str | None = None) -> list[dict]:
+        """Zwraca k najbliższych stacji (opcjonalnie z aktywnym czujnikiem wskaźnika) z odległością w km."""
+        accept = (lambda i: True) if indicator is None else (lambda i: indicator in self.indicators[i])
+        found = self.tree.nearest(to_unit_vector(latitude, longitude), k, accept)
+        return [
+            {**self.stations[index], "distance_km": round(chord_to_km(distance), 3)}
+            for distance, index in found
+        ]
+
+    def within(
+        self,
+        min_lat: float,
+        min_lon: float,
+        max_lat: float,
+        max_lon: float,
+        indicator: str | None = None,
+    ) -> list[dict]:
+        """Zwraca stacje w prostokącie widoku mapy (także przecinającym południk 180°)."""
+        crosses_antimeridian = min_lon > max_lon
+        return [
+            station
+            for i, station in enumerate(self.stations)
+            if min_lat <= station["latitude"] <= max_lat
+            and (
+                (station["longitude"] >= min_lon or station["longitude"] <= max_lon)
+                if crosses_antimeridian
+                else min_lon <= station["longitude"] <= max_lon
+            )
+            and (indicator is None or indicator in self.indicators[i])
+        ]
+
+
+def build_station_index(snapshot: MetadataSnapshot) -> StationIndex:
+    """Buduje indeks z czynnych stacji (bez daty zamknięcia) z migawki metadanych."""
+    stations = [
+        snapshot.station_json[station.code]
+        for station in snapshot.stations
+        if station.end_date is None
+    ]
+
+    indicators: dict[str, set[str]] = {}
+    for sensor in snapshot.sensors:
+        if sensor.is_active:
+            indicators.setdefault(sensor.station_code, set()).add(sensor.indicator_code)
+
+    return StationIndex(stations, indicators)
+
+
+class StationIndexHolder:
+    """Indeks stacji przebudowywany przy pierwszym użyciu po podmianie migawki metadanych."""
+
+    def __init__(self):
+        self._index: StationIndex | None = None
+        self._snapshot: MetadataSnapshot | None = None
+        self._lock = threading.Lock()
+
+    def get(self, snapshot: MetadataSnapshot | None = None) -> StationIndex:
+        snapshot = snapshot or metadata_snapshot.get()
+        if snapshot is not self._snapshot:
+            with self._lock:
+                if snapshot is not self._snapshot:
+                    self._index = build_station_index(snapshot)
+                    self._snapshot = snapshot
+        return self._index
+
+
+station_index = StationIndexHolder()
@@ -0,0 +1,131 @@
+from datetime import datetime
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+from app.models import Measurement, MeasurementRollup, Sensor
+
+PERCENTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def percentile_label(q: float) -> str:
+    return f"p{round(q * 100):02d}"
+
+
+def sensor_statistics(
+    db: Session, sensor_ids: list[int], start: datetime, end: datetime
+) -> dict[int, dict]:
+    """
+    Zwraca statystyki pomiarów każdego sensora w zakresie czasu, liczone w bazie
+    jednym zapytaniem: liczność, min, max, średnia, mediana, percentyle oraz
+    średni odstęp między pomiarami w godzinach. Sensory bez pomiarów są pomijane.
+    """
+    if not sensor_ids:
+        return {}
+
+    rows = db.execute(
+        select(
+            Measurement.sensor_id,
+            func.count().label("count"),
+            func.min(Measurement.value).label("min"),
+            func.max(Measurement.value).label("max"),
+            func.avg(Measurement.value).label("mean"),
+            *(
+                func.percentile_cont(q).within_group(Measurement.value).label(percentile_label(q))
+                for q in PERCENTILES
+            ),
+            func.min(Measurement.timestamp).label("first"),
+            func.max(Measurement.timestamp).label("last"),
+        )
+        .where(
+            Measurement.sensor_id.in_(sensor_ids),
+            Measurement.timestamp >= start,
+            Measurement.timestamp <= end,
+        )
+        .group_by(Measurement.sensor_id)
+    )
+
+    statistics = {}
+    for row in rows:
+        # Średnia różnic kolejnych znaczników czasu to (ostatni - pierwszy) / (n - 1)
+        avg_interval = (
+            (row.last - row.first).total_seconds() / 3600 / (row.count - 1)
+            if row.count > 1
+            else None
+        )
+        statistics[row.sensor_id] = {
+            "count": row.count,
+            "min": row.min,
+            "max": row.max,
+            "mean": float(row.mean),
+            "median": row.p50,
+            "percentiles": {percentile_label(q): getattr(row, percentile_label(q)) for q in PERCENTILES},
+            "first": row.first,
+            "last": row.last,
+            "avg_interval_hours": avg_interval,
+        }
+    return statistics
+
+
+def station_measurement_count(db: Session, station_code: str) -> int:
+    """
+    Liczba wszystkich pomiarów czujników stacji - suma liczności miesięcznych
+    agregatów, więc koszt zależy od liczby miesięcy, a nie od liczby pomiarów.
+    """
+    return db.execute(
+        select(func.coalesce(func.sum(MeasurementRollup.count), 0))
+        .join(Sensor, Sensor.id == MeasurementRollup.sensor_id)
+        .where(Sensor.station_code == station_code, MeasurementRollup.bucket == "month")
+    ).scalar_one()
+
+
+def value_histograms(
+    db: Session, sensor_ids: list[int], start: datetime, end: datetime, bins: int = 10
+) -> dict[int, dict]:
+    """
+    Zwraca histogram wartości każdego sensora (granice i liczności przedziałów)
+    policzony w bazie przez width_bucket na zakresie [min, max] sensora.
+    """
+    if not sensor_ids:
+        return {}
+
+    in_range = (
+        Measurement.sensor_id.in_(sensor_ids),
+        Measurement.timestamp >= start,
+        Measurement.timestamp <= end,
+    )
+    bounds = (
+        select(
+            Measurement.sensor_id,
+            func.min(Measurement.value).label("low"),
+            func.max(Measurement.value).label("high"),
+        )
+        .where(*in_range)
+        .group_by(Measurement.sensor_id)
+        .subquery()
+    )
+    # Wartość równa maksimum trafia do ostatniego przedziału, a stała seria do pierwszego
+    bucket = case(
+        (bounds.c.high == bounds.c.low, 1),
+        else_=func.least(
+            func.width_bucket(Measurement.value, bounds.c.low, bounds.c.high, bins), bins
+        ),
+    ).label("bucket")
+
+    rows = db.execute(
+        select(bounds.c.sensor_id, bounds.c.low, bounds.c.high, bucket, func.count().label("count"))
+        .select_from(Measurement)
+        .join(bounds, bounds.c.sensor_id == Measurement.sensor_id)
+        .where(*in_range)
+        .group_by(bounds.c.sensor_id, bounds.c.low, bounds.c.high, bucket)
+    )
+
+    histograms = {}
+    for row in rows:
+        histogram = histograms.get(row.sensor_id)
+        if histogram is None:
+            width = (row.high - row.low) / bins
+            histogram = histograms[row.sensor_id] = {
+                "edges": [row.low + i * width for i in range(bins)] + [row.high],
+                "counts": [0] * bins,
+            }
+        histogram["counts"][row.bucket - 1] = row.count
+    return histograms
@@ -0,0 +1,214 @@
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models import Measurement
+
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+
+RESAMPLE_STEPS = {"hour": np.timedelta64(1, "h"), "day": np.timedelta64(1, "D")}
+STEP_DURATIONS = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+# Ograniczenie rozmiaru macierzy wyniku (sensory x punkty siatki)
+MAX_RESAMPLE_CELLS = 1_000_000
+
+
+def load_series(
+    db: Session, sensor_ids: list[int], start: datetime | None = None, end: datetime | None = None
+) -> dict[int, tuple[np.ndarray, np.ndarray]]:
+    """
+    Pobiera pomiary sensorów jednym uporządkowanym zapytaniem o surowe kolumny
+    i zwraca dla każdego sensora tablice znaczników czasu (datetime64[us])
+    i wartości. Sensory bez pomiarów w zakresie mają puste tablice.
+    """
+    stmt = (
+        select(Measurement.sensor_id, Measurement.timestamp, Measurement.value)
+        .where(Measurement.sensor_id.in_(sensor_ids))
+        .order_by(Measurement.sensor_id, Measurement.timestamp)
+    )
+    if start:
+        stmt = stmt.where(Measurement.timestamp >= start)
+    if end:
+        stmt = stmt.where(Measurement.timestamp <= end)
+
+    rows = db.execute(stmt).all()
+    row_sensors = np.fromiter((row.sensor_id for row in rows), dtype=np.int64, count=len(rows))
+    timestamps = np.array([row.timestamp for row in rows], dtype="datetime64[us]")
+    values = np.fromiter((row.value for row in rows), dtype=np.float64, count=len(rows))
+
+    series = {
+        sensor_id: (np.empty(0, dtype="datetime64[us]"), np.empty(0, dtype=np.float64))
+        for sensor_id in sensor_ids
+    }
+    # Wiersze są posortowane po sensorze, więc każdy sensor to ciągły fragment tablic
+    sensors, starts = np.unique(row_sensors, return_index=True)
+    ends = np.append(starts[1:], len(rows))
+    for sensor_id, first, last in zip(sensors.tolist(), starts, ends):
+        series[sensor_id] = (timestamps[first:last], values[first:last])
+    return series
+
+
+def align_series(
+    series: dict[int, tuple[np.ndarray, np.ndarray]]
+) -> tuple[np.ndarray, dict[int, np.ndarray]]:
+    """
+    Sprowadza serie do wspólnej osi czasu (sumy znaczników czasu wszystkich serii).
+    Zwraca tę oś oraz wartości każdej serii na niej, z NaN tam, gdzie sensor
+    nie ma pomiaru.
+    """
+    timestamps = np.unique(
+        np.concatenate([ts for ts, _ in series.values()] or [np.empty(0, dtype="datetime64[us]")])
+    )
+    aligned = {}
+    for sensor_id, (sensor_timestamps, sensor_values) in series.items():
+        column = np.full(len(timestamps), np.nan)
+        column[np.searchsorted(timestamps, sensor_timestamps)] = sensor_values
+        aligned[sensor_id] = column
+    return timestamps, aligned
+
+
+def nan_to_none(values: np.ndarray) -> list[float | None]:
+    return [None if np.isnan(value) else value for value in values.tolist()]
+
+
+def check_grid_size(start: datetime, end: datetime, step: str, sensors: int) -> int:
+    """
+    Liczy komórki siatki (sensory x punkty od start do end) bez pobierania danych
+    i bez alokacji. Zgłasza ValueError, jeśli przekraczają MAX_RESAMPLE_CELLS.
+    """
+    points = max((end - start) // STEP_DURATIONS[step] + 1, 0)
+    if points * max(sensors, 1) > MAX_RESAMPLE_CELLS:
+        raise ValueError(
+            f"Zbyt duża siatka: {points} punktów x {sensors} sensorów "
+            f"(maksymalnie {MAX_RESAMPLE_CELLS} komórek)"
+        )
+    return points
+
+
+def resample(
+    series: dict[int, tuple[np.ndarray, np.ndarray]], start: datetime, end: datetime, step: str
+) -> tuple[np.ndarray, dict[int, np.ndarray], dict[int, np.ndarray]]:
+    """
+    Przenosi serie na wspólną regularną siatkę czasu od początku godziny/dnia
+    zawierającego start do end. Wartość komórki to średnia pomiarów z przedziału
+    [t, t + step), a pokrycie to liczba tych pomiarów. Puste komórki mają NaN.
+    """
+    delta = RESAMPLE_STEPS[step]
+    first = np.datetime64(start, "us").astype(f"datetime64[{np.datetime_data(delta)[0]}]")
+    check_grid_size(first.astype(datetime), end, step, len(series))
+    grid = np.arange(first, np.datetime64(end, "us") + np.timedelta64(1, "us"), delta).astype(
+        "datetime64[us]"
+    )
+
+    values, coverage = {}, {}
+    for sensor_id, (timestamps, sensor_values) in series.items():
+        cells = ((timestamps - grid[0]) // delta).astype(np.int64)
+        inside = (cells >= 0) & (cells < len(grid))
+        counts = np.bincount(cells[inside], minlength=len(grid))
+        sums = np.bincount(cells[inside], weights=sensor_values[inside], minlength=len(grid))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values[sensor_id] = np.where(counts > 0, sums / counts, np.nan)
+        coverage[sensor_id] = counts
+    return grid, values, coverage
+
+
+def fill_gaps(column: np.ndarray, method: str, limit: int | None = None) -> np.ndarray:
+    """
+    Uzupełnia brakujące komórki (NaN) serii na siatce:
+        none - bez zmian,
+        ffill - ostatnią znaną wartością, najwyżej limit komórek dalej,
+        linear - interpolacją liniową między sąsiednimi wartościami, jeśli luka
+                 ma najwyżej limit komórek.
+    Komórki przed pierwszą i po ostatniej znanej wartości nie są uzupełniane.
+    """
+    valid = ~np.isnan(column)
+    if method == "none" or valid.all() or not valid.any():
+        return column
+
+    positions = np.arange(len(column))
+    previous = np.maximum.accumulate(np.where(valid, positions, -1))
+    following = np.minimum.accumulate(np.where(valid, positions, len(column))[::-1])[::-1]
+    max_gap = np.inf if limit is None else limit
+
+    if method == "ffill":
+        fill = (
+            ~valid
+            & (previous >= 0)
+            & (following < len(column))
+            & (positions - previous <= max_gap)
+        )
+        filled = column.copy()
+        filled[fill] = column[previous[fill]]
+        return filled
+
+    gap = following - previous - 1
+    fill = ~valid & (previous >= 0) & (following < len(column)) & (gap <= max_gap)
+    filled = column.copy()
+    filled[fill] = np.interp(positions[fill], positions[valid], column[valid])
+    return filled
+
+
+def lttb(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: zwraca indeksy points punktów, które najlepiej
+    zachowują kształt wykresu. Pierwszy i ostatni punkt są zawsze zachowane,
+    a z każdego kubełka wybierany jest punkt tworzący największy trójkąt
+    z poprzednio wybranym punktem i średnią następnego kubełka.
+    """
+    length = len(x)
+    if points >= length:
+        return np.arange(length)
+    if points < 3:
+        return np.array([0, length - 1])[:points]
+
+    edges = np.linspace(1, length - 1, points - 1).astype(np.int64)
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, length - 1
+
+    previous = 0
+    for i in range(points - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x = x[end:edges[i + 2]].mean()
+            next_y = y[end:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
+
+
+def minmax(y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Decymacja min/max: dzieli serię na points // 2 równych kubełków i zwraca
+    posortowane indeksy minimum i maksimum każdego kubełka, więc piki są zachowane.
+    """
+    length = len(y)
+    buckets = points // 2
+    if points >= length or buckets < 1:
+        return np.arange(length)
+
+    edges = np.linspace(0, length, buckets + 1).astype(np.int64)[:-1]
+    bucket_of = np.repeat(np.arange(buckets), np.diff(np.append(edges, length)))
+
+    lows = np.minimum.reduceat(y, edges)[bucket_of] == y
+    highs = np.maximum.reduceat(y, edges)[bucket_of] == y
+    # Pierwsze wystąpienie minimum i maksimum w każdym kubełku
+    low_index = np.flatnonzero(lows)[np.unique(bucket_of[lows], return_index=True)[1]]
+    high_index = np.flatnonzero(highs)[np.unique(bucket_of[highs], return_index=True)[1]]
+    return np.union1d(low_index, high_index)
+
+
+def downsample(
+    timestamps: np.ndarray, values: np.ndarray, points: int, method: str = "lttb"
+) -> tuple[np.ndarray, np.ndarray]:
+    """Zmniejsza serię do co najwyżej points punktów wybraną metodą."""
+    if method == "minmax":
+        selected = minmax(values, points)
+    else:
+        selected = lttb(timestamps.astype(np.int64).astype(np.float64), values, points)
+    return timestamps[selected], values[selected]
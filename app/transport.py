@@ -0,0 +1,211 @@
+import asyncio
+import random
+import threading
+import time
+import httpx
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from app.config import settings
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Limiter zapytań wspólny dla wszystkich wywołań API GIOS (wątki i asyncio).
+    Każde zapytanie rezerwuje żeton i czeka, aż żeton będzie dostępny.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Rezerwuje żeton i zwraca liczbę sekund do odczekania."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._blocked_until - now)
+
+    def block(self, seconds: float) -> None:
+        """Wstrzymuje wszystkie zapytania, np. po odpowiedzi 429 z Retry-After."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def acquire(self) -> None:
+        time.sleep(self._reserve())
+
+    async def acquire_async(self) -> None:
+        await asyncio.sleep(self._reserve())
+
+
+class AdaptiveConcurrencyLimit:
+    """
+    Limit równoległych zapytań dostosowywany do opóźnień i błędów (AIMD).
+    Rośnie o ok. 1 na pełne okno udanych odpowiedzi, maleje o połowę po błędzie
+    i o 10%, gdy średnie opóźnienie wyraźnie przekracza najlepsze zaobserwowane.
+    """
+
+    LATENCY_TOLERANCE = 2.0
+
+    def __init__(self, minimum: int, maximum: int):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(minimum)
+        self.in_flight = 0
+        self._latency: float | None = None
+        self._best_latency = float("inf")
+
+    async def acquire(self) -> None:
+        while self.in_flight >= int(self.limit):
+            await asyncio.sleep(0.05)
+        self.in_flight += 1
+
+    def release(self, latency: float | None, ok: bool) -> None:
+        self.in_flight -= 1
+
+        if not ok:
+            self.limit = max(self.minimum, self.limit / 2)
+            return
+
+        self._latency = (
+            latency if self._latency is None else 0.8 * self._latency + 0.2 * latency
+        )
+        self._best_latency = min(self._best_latency, self._latency)
+
+        if self._latency > self._best_latency * self.LATENCY_TOLERANCE:
+            self.limit = max(self.minimum, self.limit * 0.9)
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+
+class GiosTransport:
+    """
+    Wspólna warstwa HTTP dla API GIOS: limit zapytań, ponawianie z wykładniczym
+    opóźnieniem i losowym rozrzutem oraz obsługa 429/Retry-After.
+    """
+
+    def __init__(self):
+        self.bucket = TokenBucket(settings.GIOS_RATE_PER_SECOND, settings.GIOS_BURST)
+        self.concurrency = AdaptiveConcurrencyLimit(
+            settings.GIOS_MIN_CONCURRENCY, settings.GIOS_MAX_CONCURRENCY
+        )
+        self._client: httpx.Client | None = None
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            self._client = httpx.Client(timeout=settings.GIOS_TIMEOUT_SECONDS)
+        return self._client
+
+    @staticmethod
+    def retry_after(response: httpx.Response | None) -> float | None:
+        """Odczytuje nagłówek Retry-After (sekundy lub data HTTP)."""
+        value = response.headers.get("Retry-After") if response is not None else None
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+    def backoff(self, attempt: int, response: httpx.Response | None) -> float:
+        """Zwraca opóźnienie przed kolejną próbą."""
+        retry_after = self.retry_after(response)
+        if retry_after is not None:
+            if response.status_code == 429:
+                self.bucket.block(retry_after)
+            return retry_after
+
+        cap = min(
+            settings.GIOS_BACKOFF_MAX_SECONDS,
+            settings.GIOS_BACKOFF_BASE_SECONDS * 2**attempt,
+        )
+        return random.uniform(0, cap)
+
+    @staticmethod
+    def should_retry(response: httpx.Response | None, attempt: int) -> bool:
+        if attempt >= settings.GIOS_MAX_RETRIES:
+            return False
+        return response is None or response.status_code in RETRYABLE_STATUS_CODES
+
+    def get(self, url: str) -> httpx.Response:
+        """Wysyła zapytanie GET (synchronicznie) z limitem i ponawianiem."""
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+
+            response = None
+            try:
+                response = self.client.get(url)
+            except httpx.TransportError:
+                if not self.should_retry(response, attempt):
+                    raise
+
+            if response is not None and (
+                response.status_code not in RETRYABLE_STATUS_CODES
+                or not self.should_retry(response, attempt)
+            ):
+                return response
+
+            time.sleep(self.backoff(attempt, response))
+            attempt += 1
+
+    async def get_async(self, url: str, client: httpx.AsyncClient) -> httpx.Response:
+        """Wysyła zapytanie GET (asynchronicznie) z limitem i ponawianiem."""
+        attempt = 0
+        while True:
+            await self.bucket.acquire_async()
+            await self.concurrency.acquire()
+
+            response, latency = None, None
+            started = time.monotonic()
+            try:
+                response = await client.get(url)
+                latency = time.monotonic() - started
+            except httpx.TransportError:
+                if not self.should_retry(response, attempt):
+                    raise
+            finally:
+                self.concurrency.release(
+                    latency,
+                    ok=response is not None
+                    and response.status_code not in RETRYABLE_STATUS_CODES,
+                )
+
+            if response is not None and (
+                response.status_code not in RETRYABLE_STATUS_CODES
+                or not self.should_retry(response, attempt)
+            ):
+                return response
+
+            await asyncio.sleep(self.backoff(attempt, response))
+            attempt += 1
+
+    def get_json(self, url: str) -> dict:
+        response = self.get(url)
+        response.raise_for_status()
+        return response.json()
+
+    async def get_json_async(self, url: str, client: httpx.AsyncClient) -> dict:
+        response = await self.get_async(url, client)
+        response.raise_for_status()
+        return response.json()
+
+
+gios_transport = GiosTransport()
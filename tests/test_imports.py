@@ -0,0 +1,40 @@
+import importlib
+
+import pytest
+
+MODULES = [
+    "app.config",
+    "app.database",
+    "app.models",
+    "app.schemes",
+    "app.pagination",
+    "app.ingestion",
+    "app.partitions",
+    "app.rollups",
+    "app.scheduler",
+    "app.coordination",
+    "app.jobs",
+    "app.reports",
+    "app.report_pdf",
+    "app.exports",
+    "app.stats",
+    "app.snapshot",
+    "app.spatial",
+    "app.timeseries",
+    "app.router",
+    "app.migrations",
+    "app.main",
+]
+
+
+@pytest.mark.parametrize("module", MODULES)
+def test_module_imports(module):
+    importlib.import_module(module)
+
+
+def test_app_routes_are_registered():
+    from app.main import get_configured_server_app
+
+    paths = {route.path for route in get_configured_server_app().routes}
+    assert "/api/v1/measurements/batch" in paths
+    assert "/api/v1/measurements/resample" in paths
@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app.ingestion import upsert_measurements
+from app.models import Measurement
+
+START = datetime(2024, 1, 1)
+
+
+def rows(values: dict[int, float], sensor_id: int = 1) -> list[dict]:
+    return [
+        {"sensor_id": sensor_id, "timestamp": START + timedelta(hours=hour), "value": value}
+        for hour, value in values.items()
+    ]
+
+
+def test_upsert_counts_inserted_updated_and_skipped(db, sensors):
+    stats, changed = upsert_measurements(db, rows({0: 1.0, 1: 2.0, 2: 3.0}))
+    db.commit()
+    assert stats == {"inserted": 3, "updated": 0, "skipped": 0}
+    assert len(changed) == 3
+
+    # godzina 1 skorygowana, 2 bez zmian, 3 nowa, a 3 powtórzona w paczce
+    stats, changed = upsert_measurements(db, rows({1: 2.5, 2: 3.0, 3: 4.0}) + rows({3: 4.0}))
+    db.commit()
+    assert stats == {"inserted": 1, "updated": 1, "skipped": 2}
+    assert sorted(changed) == [(1, START + timedelta(hours=1)), (1, START + timedelta(hours=3))]
+
+    stored = db.scalars(select(Measurement.value).order_by(Measurement.timestamp)).all()
+    assert stored == [1.0, 2.5, 3.0, 4.0]
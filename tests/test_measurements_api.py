@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import models
+from app.main import get_configured_server_app
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def client(db, sensors):
+    for hour in range(6):
+        db.add(models.Measurement(sensor_id=1, timestamp=START + timedelta(hours=hour), value=float(hour)))
+    db.add(models.Measurement(sensor_id=2, timestamp=START + timedelta(hours=2, minutes=30), value=10.0))
+    db.commit()
+    # Bez bloku with - lifespan (harmonogram, migawka) nie jest uruchamiany
+    return TestClient(get_configured_server_app())
+
+
+def test_batch_returns_columns_on_common_time_axis(client):
+    response = client.post(
+        "/api/v1/measurements/batch",
+        json={"sensor_ids": [1, 2], "start_time": "2024-01-01T00:00:00", "end_time": "2024-01-02T00:00:00"},
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body["timestamps"]) == 7
+    assert body["values"]["1"] == [0.0, 1.0, 2.0, None, 3.0, 4.0, 5.0]
+    assert body["values"]["2"] == [None, None, None, 10.0, None, None, None]
+
+
+def test_resample_aligns_sensors_on_hourly_grid(client):
+    response = client.post(
+        "/api/v1/measurements/resample",
+        json={
+            "sensor_ids": [1, 2],
+            "start_time": "2024-01-01T00:00:00",
+            "end_time": "2024-01-01T06:00:00",
+            "step": "hour",
+            "fill": "ffill",
+        },
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body["timestamps"]) == 7
+    assert body["values"]["1"] == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0, None]
+    assert body["values"]["2"] == [None, None, 10.0, None, None, None, None]
+    assert body["coverage"]["1"] == [1, 1, 1, 1, 1, 1, 0]
+
+
+def test_resample_rejects_oversized_grid(client):
+    response = client.post(
+        "/api/v1/measurements/resample",
+        json={"sensor_ids": [1, 2], "start_time": "2024-01-01T00:00:00", "end_time": "2224-01-01T00:00:00"},
+    )
+
+    assert response.status_code == 400
+    assert "Zbyt duża siatka" in response.json()["detail"]
@@ -0,0 +1,63 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from app.config import settings
+from app.database import Base
+from app.ingestion import upsert_measurements
+from app.migrations import migrate
+from app.models import Measurement
+from app.partitions import is_partitioned, list_partitions, partition_name
+
+OLD = datetime(2023, 6, 15)
+
+
+@pytest.fixture
+def partitioned(database, db, sensors, monkeypatch):
+    """Włącza partycjonowanie i przebudowuje istniejącą tabelę przez migrate."""
+    db.add_all(
+        [
+            Measurement(sensor_id=1, timestamp=OLD, value=1.0),
+            Measurement(sensor_id=1, timestamp=datetime.now().replace(microsecond=0), value=2.0),
+        ]
+    )
+    db.commit()
+
+    monkeypatch.setattr(settings, "MEASUREMENTS_PARTITIONED", True)
+    migrate(database)
+    yield database
+
+    # Kolejne testy korzystają ze zwykłej tabeli
+    db.close()
+    Base.metadata.drop_all(database)
+    monkeypatch.setattr(settings, "MEASUREMENTS_PARTITIONED", False)
+    migrate(database)
+
+
+def test_migrate_converts_existing_table_and_keeps_rows(partitioned, db):
+    assert is_partitioned(partitioned)
+    partitions = list_partitions(partitioned)
+    assert "measurements_default" in partitions
+    assert partition_name(date(2023, 6, 1)) in partitions
+    assert partition_name(date.today().replace(day=1)) in partitions
+
+    assert db.scalar(select(func.count()).select_from(Measurement)) == 2
+    # Sekwencja id przeszła na nową tabelę
+    db.add(Measurement(sensor_id=2, timestamp=OLD, value=3.0))
+    db.commit()
+    assert db.scalar(select(func.max(Measurement.id))) == 3
+
+
+def test_upsert_counts_on_partitioned_table(partitioned, db):
+    rows = [
+        {"sensor_id": 1, "timestamp": OLD, "value": 1.5},
+        {"sensor_id": 1, "timestamp": OLD + timedelta(hours=1), "value": 4.0},
+        {"sensor_id": 2, "timestamp": OLD, "value": 5.0},
+    ]
+
+    stats, changed = upsert_measurements(db, rows)
+    db.commit()
+
+    assert stats == {"inserted": 2, "updated": 1, "skipped": 0}
+    assert len(changed) == 3